@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# Benchmark rasterIO.readrasterband against the original scanline/struct.unpack read loop.
+#
+# Usage: python bench_readrasterband.py [XSize] [YSize]
+import sys, os, time, struct, tempfile
+import numpy as np
+import numpy.ma as ma
+import osgeo.gdal as gdal
+from osgeo.gdalconst import *
+# rasterIO lives in the plugin directory above this one
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import rasterIO
+
+# original read loop (rasterIO 1.0.1), kept here as the reference implementation
+def scanline_readrasterband(dataset, aband):
+	band = dataset.GetRasterBand(aband)
+	NoDataVal = band.GetNoDataValue()
+	datarray = np.zeros( ( band.YSize,band.XSize ), dtype=np.float32 )
+	for i in range(band.YSize):
+		scanline = band.ReadRaster( 0, i, band.XSize, 1, band.XSize, 1, GDT_Float32)
+		tuple_of_floats = struct.unpack('f' * band.XSize, scanline)
+		datarray[i,:] = tuple_of_floats
+	return ma.masked_invalid(ma.masked_values(datarray, NoDataVal))
+
+# create a synthetic Float32 GeoTiff with a NoData border
+def make_raster(fname, XSize, YSize):
+	driver = gdal.GetDriverByName('GTiff')
+	dst_ds = driver.Create(fname, XSize, YSize, 1, gdal.GDT_Float32)
+	data = np.random.random((YSize, XSize)).astype(np.float32)
+	data[:, :10] = 9999.0
+	dst_ds.GetRasterBand(1).SetNoDataValue(9999.0)
+	dst_ds.GetRasterBand(1).WriteArray(data)
+	dst_ds = None
+
+# time a read function, returning best of repeats and the last result
+def timeit(func, fname, repeats=3):
+	best = None
+	for i in range(repeats):
+		dataset = rasterIO.opengdalraster(fname)
+		start = time.time()
+		result = func(dataset, 1)
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+		dataset = None
+	return best, result
+
+def main(arg=sys.argv):
+	XSize = 4000
+	YSize = 4000
+	if len(arg) > 2:
+		XSize = int(arg[1])
+		YSize = int(arg[2])
+	fname = os.path.join(tempfile.mkdtemp(), 'bench_readrasterband.tif')
+	make_raster(fname, XSize, YSize)
+	t_old, old = timeit(scanline_readrasterband, fname)
+	t_new, new = timeit(rasterIO.readrasterband, fname)
+	# check results are identical
+	if not (np.array_equal(old.mask, new.mask) and np.array_equal(old.filled(0), new.filled(0))):
+		sys.stderr.write('Error: readrasterband result differs from scanline reference.\n')
+		return 1
+	mpix = XSize * YSize / 1.0e6
+	sys.stdout.write('raster: %i x %i (%.1f MPix)\n' % (XSize, YSize, mpix))
+	sys.stdout.write('scanline loop:  %.3f s (%.1f MPix/s)\n' % (t_old, mpix / t_old))
+	sys.stdout.write('readrasterband: %.3f s (%.1f MPix/s)\n' % (t_new, mpix / t_new))
+	sys.stdout.write('speedup: %.1fx\n' % (t_old / t_new))
+	os.remove(fname)
+	return 0
+
+if __name__=='__main__':
+	sys.exit(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# Benchmark suite for rasterIO, rasterCalc and rasterStats on synthetic rasters (see synthraster.py).
+#
+# Each benchmark is run in its own process (best time of --repeats runs), recording seconds, throughput in
+# MPix/s and peak resident memory, and the results are written to a JSON file. Two result files can be
+# compared to find regressions.
+#
+# Usage: python bench_suite.py [--size 4000x4000] [--dtype Float32] [--format GTiff] [--layout tiled]
+#		[--block 256] [--compress LZW] [--nodata-fraction 0.05] [--repeats 3] [--output results.json]
+#		[--only read,ndvi] [--inprocess]
+#        python bench_suite.py --compare old.json new.json [--threshold 0.1]
+import sys, os, time, shutil, tempfile, platform, optparse
+import numpy as np
+import numpy.ma as ma
+import osgeo.gdal as gdal
+try:
+	import json
+except ImportError:
+	json = None
+try:
+	import resource
+except ImportError:
+	resource = None
+try:
+	import multiprocessing
+except ImportError:
+	multiprocessing = None
+# rasterIO lives in the plugin directory above this one
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import rasterIO
+import rasterCalc
+import rasterStats
+import synthraster
+
+# equations timed by the band math benchmarks
+NDVI = '(b2 - b1) / (b2 + b1)'
+CHAIN = '((b1 * 0.5 + b2 * 0.25) - (b1 - b2) * 2 + sqrt(abs(b2 - b1)) / 3) * ((b1 + b2) / (b1 + 1)) + maximum(b1, b2) * 0.1'
+# number of opens timed by the open benchmark
+OPENS = 100
+
+# function to get peak resident memory of this process
+def peakrss():
+	'''Returns peak resident memory of this process in MB, or None if it is not available.'''
+	if resource == None:
+		return None
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == 'darwin':
+		# bytes on Mac OS X, kilobytes on Linux
+		return rss / 1048576.0
+	return rss / 1024.0
+
+# function to read the bands used by band math benchmarks
+def namespace(fname):
+	dataset = rasterIO.opengdalraster(fname)
+	return {'b1':rasterIO.readrasterband(dataset, 1), 'b2':rasterIO.readrasterband(dataset, 2),
+		'sqrt':np.sqrt, 'abs':np.abs, 'maximum':np.maximum}
+
+# function to read the bands used by an equation, checking that it is compiled rather than evaluated by eval
+def compiled(eqstring, fname):
+	bands = namespace(fname)
+	# raises rasterCalc.UnsupportedError if the equation would be timed through the eval fallback
+	rasterCalc.compileequation(eqstring, bands)
+	return bands
+
+# Benchmarks, each accepts the synthetic raster and settings and returns (setup, run) functions.
+# setup (or None) is not timed, its result is passed to run. Output files are written to opts.workdir.
+def bench_open(fname, opts):
+	def run(setup):
+		for i in range(OPENS):
+			rasterIO.opengdalraster(fname)
+	return None, run
+
+def bench_metadata(fname, opts):
+	def run(setup):
+		dataset = rasterIO.opengdalraster(fname)
+		for i in range(OPENS):
+			driver, XSize, YSize, proj, geotrans = rasterIO.readrastermeta(dataset)
+			rasterIO.wkt2epsg(proj)
+	return None, run
+
+def bench_read(fname, opts):
+	def run(setup):
+		rasterIO.readrasterband(rasterIO.opengdalraster(fname), 1)
+	return None, run
+
+def bench_read_float32(fname, opts):
+	def run(setup):
+		rasterIO.readrasterband(rasterIO.opengdalraster(fname), 1, np.float32)
+	return None, run
+
+def bench_read_preview(fname, opts):
+	def run(setup):
+		dataset = rasterIO.opengdalraster(fname)
+		rasterIO.readrasterband(dataset, 1, outsize=rasterIO.previewsize(dataset.RasterXSize, dataset.RasterYSize))
+	return None, run
+
+def bench_mask(fname, opts):
+	def setup():
+		dataset = rasterIO.opengdalraster(fname)
+		return dataset, ma.getdata(rasterIO.readrasterband(dataset, 1)).copy()
+	def run(setup):
+		dataset, data = setup
+		rasterIO._maskarray(dataset.GetRasterBand(1), data)
+	return setup, run
+
+def bench_ndvi(fname, opts):
+	def run(setup):
+		rasterCalc.evaluate(NDVI, setup)
+	return lambda: compiled(NDVI, fname), run
+
+def bench_chain(fname, opts):
+	def run(setup):
+		rasterCalc.evaluate(CHAIN, setup)
+	return lambda: compiled(CHAIN, fname), run
+
+def bench_stats(fname, opts):
+	def run(setup):
+		rasterStats.arraystats(setup['b1'])
+	return lambda: namespace(fname), run
+
+def bench_stats_disk(fname, opts):
+	def run(setup):
+		rasterStats.clearcache()
+		rasterStats.bandstats(fname, 1)
+	return None, run
+
+def bench_write(fname, opts):
+	def run(setup):
+		YSize, XSize = setup.shape
+		rasterIO.writerasterband(setup, os.path.join(opts.workdir, 'write' + extension(opts.format)), opts.format,
+			XSize, YSize, synthraster.GEOTRANS, synthraster.EPSG, opts.compress)
+	return lambda: rasterIO.readrasterband(rasterIO.opengdalraster(fname), 1), run
+
+def bench_writeparallel(fname, opts):
+	def setup():
+		dataset = rasterIO.opengdalraster(fname)
+		return dataset.RasterXSize, dataset.RasterYSize
+	def run(setup):
+		XSize, YSize = setup
+		rasterCalc.writeparallel(NDVI, {}, os.path.join(opts.workdir, 'ndvi' + extension(opts.format)), opts.format,
+			XSize, YSize, synthraster.GEOTRANS, synthraster.EPSG, sources={'b1':(fname, 1), 'b2':(fname, 2)}, compress=opts.compress)
+	return setup, run
+
+BENCHMARKS = (('open', bench_open), ('metadata', bench_metadata), ('read', bench_read), ('read_float32', bench_read_float32),
+	('read_preview', bench_read_preview), ('mask', bench_mask), ('ndvi', bench_ndvi), ('chain', bench_chain),
+	('stats', bench_stats), ('stats_disk', bench_stats_disk), ('write', bench_write), ('writeparallel', bench_writeparallel))
+
+def extension(format):
+	return {'GTiff':'.tif', 'HFA':'.img'}.get(format, '.dat')
+
+# function to run one benchmark
+def runbenchmark(name, fname, opts):
+	'''Accepts benchmark name, synthetic raster and settings, returns dict of results.'''
+	bench = dict(BENCHMARKS)[name]
+	setup, run = bench(fname, opts)
+	data = None
+	if setup != None:
+		data = setup()
+	times = []
+	for i in range(opts.repeats):
+		start = time.time()
+		run(data)
+		times.append(time.time() - start)
+	dataset = rasterIO.opengdalraster(fname)
+	mpix = dataset.RasterXSize * dataset.RasterYSize / 1.0e6
+	result = {'name':name, 'seconds':min(times), 'mean_seconds':sum(times) / len(times), 'repeats':len(times),
+		'mpix':mpix, 'mpix_per_s':None, 'peak_rss_mb':peakrss()}
+	if name not in ('open', 'metadata') and min(times) > 0:
+		result['mpix_per_s'] = mpix / min(times)
+	return result
+
+def _child(queue, name, fname, opts):
+	try:
+		queue.put(runbenchmark(name, fname, opts))
+	except Exception, e:
+		queue.put({'name':name, 'error':'%s: %s' % (type(e).__name__, e)})
+
+# function to run one benchmark in its own process, so peak memory is that of the benchmark alone
+def isolated(name, fname, opts):
+	'''Accepts benchmark name, synthetic raster and settings, returns dict of results.'''
+	if opts.inprocess or multiprocessing == None:
+		try:
+			return runbenchmark(name, fname, opts)
+		except Exception, e:
+			return {'name':name, 'error':'%s: %s' % (type(e).__name__, e)}
+	queue = multiprocessing.Queue()
+	process = multiprocessing.Process(target=_child, args=(queue, name, fname, opts))
+	process.start()
+	result = queue.get()
+	process.join()
+	return result
+
+# function to compare two result files
+def compare(oldfile, newfile, threshold=0.1):
+	'''Accepts two JSON result files and relative threshold, prints time ratios, returns number of regressions
+	(benchmarks slower than threshold).'''
+	old = dict([(r['name'], r) for r in json.load(open(oldfile))['results'] if 'seconds' in r])
+	new = dict([(r['name'], r) for r in json.load(open(newfile))['results'] if 'seconds' in r])
+	regressions = 0
+	sys.stdout.write('%-14s %10s %10s %8s\n' % ('benchmark', 'old (s)', 'new (s)', 'ratio'))
+	for name, bench in BENCHMARKS:
+		if name in old and name in new:
+			ratio = new[name]['seconds'] / max(old[name]['seconds'], 1e-9)
+			flag = ''
+			if ratio > 1 + threshold:
+				flag = ' slower'
+				regressions += 1
+			elif ratio < 1 - threshold:
+				flag = ' faster'
+			sys.stdout.write('%-14s %10.4f %10.4f %8.2f%s\n' % (name, old[name]['seconds'], new[name]['seconds'], ratio, flag))
+	return regressions
+
+def main(arg=sys.argv):
+	parser = optparse.OptionParser(usage='%prog [options] | --compare old.json new.json')
+	parser.add_option('--size', default='4000x4000', help='raster size, XSizexYSize')
+	parser.add_option('--dtype', default='Float32', help='GDAL datatype name')
+	parser.add_option('--format', default='GTiff', help='GTiff or HFA')
+	parser.add_option('--layout', default='tiled', help='tiled or striped')
+	parser.add_option('--block', type='int', default=256, help='block size in pixels')
+	parser.add_option('--compress', default=None, help='compression, e.g. LZW or DEFLATE')
+	parser.add_option('--nodata-fraction', dest='nodatafraction', type='float', default=0.05, help='fraction of NoData pixels')
+	parser.add_option('--repeats', type='int', default=3, help='runs of each benchmark, the best is recorded')
+	parser.add_option('--output', default='bench_results.json', help='JSON results file')
+	parser.add_option('--only', default=None, help='comma separated benchmark names')
+	parser.add_option('--inprocess', action='store_true', default=False, help='run benchmarks in this process')
+	parser.add_option('--compare', action='store_true', default=False, help='compare two result files')
+	parser.add_option('--threshold', type='float', default=0.1, help='relative slowdown reported as a regression')
+	opts, args = parser.parse_args(arg[1:])
+	if json == None:
+		sys.stderr.write('Error: the json module (Python 2.6 or greater) is needed to write results.\n')
+		return 1
+	if opts.compare:
+		if len(args) != 2:
+			parser.error('--compare needs two result files')
+		return min(compare(args[0], args[1], opts.threshold), 1)
+	XSize, YSize = [int(v) for v in opts.size.lower().split('x')]
+	names = [name for name, bench in BENCHMARKS]
+	if opts.only != None:
+		names = [name for name in opts.only.split(',') if name in dict(BENCHMARKS)]
+	opts.workdir = tempfile.mkdtemp(prefix='bench_suite_')
+	try:
+		fname = os.path.join(opts.workdir, 'synthetic' + extension(opts.format))
+		sys.stdout.write('Creating %i x %i %s %s (%s, block %i, compression %s, NoData %.0f%%)\n' % (XSize, YSize, opts.dtype,
+			opts.format, opts.layout, opts.block, opts.compress, opts.nodatafraction * 100))
+		synthraster.makeraster(fname, XSize, YSize, 2, opts.dtype, opts.format, opts.layout == 'tiled', opts.block,
+			opts.compress, nodatafraction=opts.nodatafraction)
+		results = []
+		for name in names:
+			result = isolated(name, fname, opts)
+			results.append(result)
+			if 'error' in result:
+				sys.stderr.write('%-14s failed: %s\n' % (name, result['error']))
+			else:
+				throughput = ''
+				if result['mpix_per_s'] != None:
+					throughput = '%8.1f MPix/s' % result['mpix_per_s']
+				rss = ''
+				if result['peak_rss_mb'] != None:
+					rss = '%8.0f MB peak' % result['peak_rss_mb']
+				sys.stdout.write('%-14s %8.4f s %s %s\n' % (name, result['seconds'], throughput, rss))
+	finally:
+		shutil.rmtree(opts.workdir, True)
+	config = {'XSize':XSize, 'YSize':YSize, 'dtype':opts.dtype, 'format':opts.format, 'layout':opts.layout,
+		'block':opts.block, 'compress':opts.compress, 'nodata_fraction':opts.nodatafraction, 'repeats':opts.repeats}
+	environment = {'python':platform.python_version(), 'numpy':np.__version__, 'platform':platform.platform(),
+		'gdal':getattr(gdal, '__version__', None), 'rasterIO':rasterIO.__version__, 'date':time.strftime('%Y-%m-%d %H:%M:%S')}
+	output = open(opts.output, 'w')
+	json.dump({'config':config, 'environment':environment, 'results':results}, output, indent=1)
+	output.close()
+	sys.stdout.write('Results written to %s\n' % opts.output)
+	return 0
+
+if __name__=='__main__':
+	sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# Synthetic rasters for benchmarks: configurable size, datatype, format, block layout, compression and NoData density.
+#
+# Usage: python synthraster.py outfile [XSize] [YSize] [dtype] [format]
+import sys, os
+import numpy as np
+import osgeo.gdal as gdal
+from osgeo.gdalconst import *
+# rasterIO lives in the plugin directory above this one
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import rasterIO
+
+# British National Grid, as used by the example data
+EPSG = 27700
+GEOTRANS = (400000.0, 10.0, 0.0, 500000.0, 0.0, -10.0)
+
+# function to get creation options of a synthetic raster
+def layoutoptions(format, tiled=True, blocksize=256, compress=None):
+	'''Accepts format, tiled (True) or striped (False) layout, block size and compression, returns creation options.'''
+	options = []
+	if format == 'GTiff':
+		if tiled:
+			options += ['TILED=YES', 'BLOCKXSIZE=%i' % blocksize, 'BLOCKYSIZE=%i' % blocksize]
+		else:
+			options += ['TILED=NO', 'BLOCKYSIZE=%i' % max(1, blocksize // 16)]
+		if compress != None and compress != 'None':
+			options.append('COMPRESS=%s' % compress)
+	elif format == 'HFA':
+		options.append('BLOCKSIZE=%i' % blocksize)
+		if compress != None and compress != 'None':
+			options.append('COMPRESSED=YES')
+	return options
+
+# function to create a synthetic raster
+def makeraster(fname, XSize, YSize, nbands=2, dtype='Float32', format='GTiff', tiled=True, blocksize=256, compress=None,
+		nodata=9999, nodatafraction=0.05, seed=0):
+	'''Accepts file name, size, number of bands, GDAL datatype name, format, layout, compression, NoDataValue and
+	fraction of NoData pixels, writes a raster of smooth red / near infra-red like bands with random noise and
+	random NoData pixels, written strip by strip. Returns the file name.'''
+	gdal_dtype = rasterIO.GDAL_TYPE_NAMES[dtype]
+	npdtype = np.dtype(rasterIO.GDAL_NUMPY_TYPES[gdal_dtype])
+	nodata = rasterIO.fitnodata(npdtype, nodata)
+	driver = gdal.GetDriverByName(format)
+	dataset = driver.Create(fname, XSize, YSize, nbands, gdal_dtype, layoutoptions(format, tiled, blocksize, compress))
+	if dataset == None:
+		raise IOError
+	dataset.SetGeoTransform(GEOTRANS)
+	dataset.SetProjection(rasterIO.epsg2wkt(EPSG))
+	random = np.random.RandomState(seed)
+	# values in the lower part of the datatype's range, so band math does not overflow
+	if npdtype.kind in 'iu':
+		top = min(np.iinfo(npdtype).max // 4, 10000)
+	else:
+		top = 10000
+	rows = max(1, 4194304 // (XSize * npdtype.itemsize))
+	x = np.linspace(0.0, 1.0, XSize)
+	for aband in range(1, nbands + 1):
+		band = dataset.GetRasterBand(aband)
+		band.SetNoDataValue(nodata)
+		for yoff in range(0, YSize, rows):
+			ysize = min(rows, YSize - yoff)
+			y = np.linspace(float(yoff) / YSize, float(yoff + ysize) / YSize, ysize)[:, np.newaxis]
+			base = 0.5 + 0.25 * np.sin(6.0 * x + aband) * np.cos(4.0 * y)
+			values = (base + 0.1 * random.random_sample((ysize, XSize))) * top
+			values = values.astype(npdtype)
+			if nodatafraction > 0:
+				values[random.random_sample((ysize, XSize)) < nodatafraction] = nodata
+			band.WriteArray(values, 0, yoff)
+	dataset = None
+	return fname
+
+def main(arg=sys.argv):
+	if len(arg) < 2:
+		sys.stderr.write('Usage: python synthraster.py outfile [XSize] [YSize] [dtype] [format]\n')
+		return 1
+	XSize = YSize = 4000
+	dtype = 'Float32'
+	format = 'GTiff'
+	if len(arg) > 3:
+		XSize = int(arg[2])
+		YSize = int(arg[3])
+	if len(arg) > 4:
+		dtype = arg[4]
+	if len(arg) > 5:
+		format = arg[5]
+	makeraster(arg[1], XSize, YSize, dtype=dtype, format=format)
+	return 0
+
+if __name__=='__main__':
+	sys.exit(main())
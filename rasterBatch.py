@@ -0,0 +1,160 @@
+''' Library of functions to process batches of raster files in parallel.
+
+rasterBatch
+===========
+
+Files matching a glob pattern (or a list of files) are processed by a pool of worker processes, one per CPU
+by default. Files are handed to workers one at a time from a shared queue as each worker becomes free, so
+large and small files are balanced across the workers. Each file is processed by a function accepting the
+file name, or by a calculator equation (see EquationJob). A file which fails is recorded with its error and
+does not stop the rest of the batch.
+
+	>>> import rasterBatch
+	>>> results = rasterBatch.runbatch('/data/*.tif', '(b2 - b1) / (b2 + b1)', outpattern='%s_ndvi.tif')
+	>>> for result in rasterBatch.failures(results):
+	...	print result.fname, result.error
+
+Functions given to runbatch must be defined at module level (not lambdas or nested functions) so that
+they can be sent to the worker processes. Scripts using runbatch should call it from within an
+"if __name__ == '__main__':" block, as worker processes import the script.
+
+Dependencies
+------------
+multiprocessing (Python 2.6 or greater), files are processed one by one without it.
+
+License
+-------
+Released under the Simplified BSD License (see LICENSE.txt).
+'''
+__version__ = "1.0.0"
+#!/usr/bin/env python
+import os, sys, glob, time, traceback
+import numpy as np
+import numpy.ma as ma
+import rasterIO
+import rasterCalc
+import rasterStats
+try:
+	import multiprocessing
+except ImportError:
+	multiprocessing = None
+
+# class to hold the outcome of processing a file
+class Result:
+	'''Outcome of processing one file: file name, success flag, value returned by the job (or None),
+	error message with traceback (or None) and processing time in seconds.'''
+
+	def __init__(self, fname, ok, value=None, error=None, seconds=0.0):
+		self.fname = fname
+		self.ok = ok
+		self.value = value
+		self.error = error
+		self.seconds = seconds
+
+# class to process a file with a calculator equation
+class EquationJob:
+	'''Processes a file with a calculator equation and writes the result to a new file.
+
+	Bands of the file are available to the equation as b1, b2, ... bN, with numpy (np), numpy.ma (ma)
+	and rasterStats mean and std. The output file name is outpattern with %s replaced by the input file
+	name without its extension. Returns the output file name.'''
+
+	def __init__(self, eqstring, outpattern='%s_out.tif', format='GTiff', compress=None, dtype=None):
+		self.eqstring = eqstring
+		self.outpattern = outpattern
+		self.format = format
+		self.compress = compress
+		self.dtype = dtype
+
+	def outfile(self, fname):
+		'''Accepts input file name, returns output file name.'''
+		return self.outpattern % os.path.splitext(fname)[0]
+
+	def __call__(self, fname):
+		dataset = rasterIO.opengdalraster(fname)
+		driver, XSize, YSize, proj, geotrans = rasterIO.readrastermeta(dataset)
+		namespace = {'ma':ma, 'np':np, 'numpy':np, 'mean':rasterStats.mean, 'std':rasterStats.std}
+		sources = {}
+		# read only the bands used by the equation
+		for name in rasterCalc.equationnames(self.eqstring):
+			if name[:1] == 'b' and name[1:].isdigit() and 0 < int(name[1:]) <= dataset.RasterCount:
+				namespace[name] = rasterIO.readrasterband(dataset, int(name[1:]))
+				sources[name] = (fname, int(name[1:]))
+		outfile = self.outfile(fname)
+		# write the projection of the input file unchanged
+		if rasterCalc.streamable(self.eqstring, namespace, sources):
+			rasterCalc.writetiles(self.eqstring, namespace, outfile, self.format, XSize, YSize, geotrans, proj,
+				sources=sources, compress=self.compress, dtype=self.dtype)
+		else:
+			newband = rasterCalc.evaluate(self.eqstring, namespace, sources)
+			if newband.dtype.kind == 'f':
+				newband = ma.masked_values(newband, rasterCalc.NODATA)
+			rasterIO.writerasterband(newband, outfile, self.format, XSize, YSize, geotrans, proj, self.compress, dtype=self.dtype)
+		return outfile
+
+# function to process one file, run by the worker processes
+def _work(args):
+	'''Accepts (job, file name), returns Result of running job on the file.'''
+	job, fname = args
+	start = time.time()
+	try:
+		value = job(fname)
+	except Exception:
+		return Result(fname, False, error=traceback.format_exc(), seconds=time.time() - start)
+	return Result(fname, True, value, seconds=time.time() - start)
+
+# function to report progress of a batch
+def printprogress(done, total, result):
+	'''Accepts number of files processed, total number of files and Result of the last file, writes progress to stdout
+	(or the error to stderr).'''
+	if result.ok:
+		sys.stdout.write('[%i/%i] %s processed in %.1f s\n' % (done, total, result.fname, result.seconds))
+	else:
+		sys.stderr.write('[%i/%i] %s failed:\n%s' % (done, total, result.fname, result.error))
+
+# function to process a batch of files
+def runbatch(pattern, job, processes=None, progress=printprogress, outpattern='%s_out.tif', format='GTiff', compress=None, dtype=None):
+	'''Accepts glob pattern (or list) of files, job (function accepting a file name, or equation string),
+	number of worker processes (default one per CPU) and progress function (see printprogress, or None),
+	returns list of Result, one per file in file name order.
+
+	Equation jobs write their output to outpattern in format, with compression and output datatype
+	(see EquationJob and rasterIO.writeparams). With one process, or without multiprocessing, files
+	are processed in this process.'''
+	if isinstance(pattern, basestring):
+		files = sorted(glob.glob(pattern))
+	else:
+		files = list(pattern)
+	if isinstance(job, basestring):
+		job = EquationJob(job, outpattern, format, compress, dtype)
+	if processes == None and multiprocessing != None:
+		processes = multiprocessing.cpu_count()
+	processes = min(processes or 1, max(len(files), 1))
+	tasks = [(job, fname) for fname in files]
+	results = []
+	if processes < 2 or multiprocessing == None:
+		for task in tasks:
+			results.append(_work(task))
+			if progress != None:
+				progress(len(results), len(files), results[-1])
+	else:
+		pool = multiprocessing.Pool(processes)
+		try:
+			# one file per task, so free workers take the next file from the queue
+			for result in pool.imap_unordered(_work, tasks, 1):
+				results.append(result)
+				if progress != None:
+					progress(len(results), len(files), result)
+			pool.close()
+		except:
+			pool.terminate()
+			raise
+		pool.join()
+	order = dict([(files[i], i) for i in range(len(files))])
+	results.sort(key=lambda result: order[result.fname])
+	return results
+
+# function to get failed files of a batch
+def failures(results):
+	'''Accepts list of Result, returns the Results of files which failed.'''
+	return [result for result in results if not result.ok]
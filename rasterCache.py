@@ -0,0 +1,141 @@
+''' Memory limited cache of raster bands read from disk as Numpy masked arrays.
+
+rasterCache
+===========
+
+Bands are cached by file name, band number and file modification time and size (GDAL virtual files,
+e.g. /vsizip/, are cached by name and band number). When the total size of cached
+bands exceeds the memory budget the least recently used bands are evicted. Evicted bands are read again
+from their source file when next requested or, if spilling is enabled, restored (memory-mapped) from a
+spill file in a temporary directory.
+
+	>>> import rasterCache
+	>>> cache = rasterCache.BandCache(budget=512*1048576)
+	>>> band_1 = cache.get('/data/image.tif', 1)
+	>>> inmemory, budget, nbands, nspilled = cache.usage()
+
+Hits and misses are counted by rasterProfile when it is enabled.
+
+License
+-------
+Released under the Simplified BSD License (see LICENSE.txt).
+'''
+__version__ = "1.0.0"
+#!/usr/bin/env python
+import os, shutil, tempfile, threading
+import numpy as np
+import numpy.ma as ma
+import rasterIO
+import rasterProfile
+
+# default memory budget of cache in bytes
+BUDGET_BYTES = 1073741824
+
+# function to get memory used by an array
+def rastersize(raster):
+	'''Accepts Numpy (masked) array, returns bytes used by data and mask.'''
+	nbytes = ma.getdata(raster).nbytes
+	if ma.getmask(raster) is not ma.nomask:
+		nbytes += ma.getmask(raster).nbytes
+	return nbytes
+
+# class to cache bands
+class BandCache:
+	'''Cache of bands read with rasterIO.readrasterband, limited to budget bytes of memory.'''
+
+	def __init__(self, budget=BUDGET_BYTES, spill=False, spilldir=None):
+		self.budget = budget
+		self.spill = spill
+		self.spilldir = spilldir
+		# cached bands, key is (file name, band number, file signature), value is (raster, bytes)
+		self.bands = {}
+		# keys of cached bands, least recently used first
+		self.order = []
+		# spilled bands, value is (data file, mask file or None, fill value)
+		self.spilled = {}
+		self.inmemory = 0
+		self.lock = threading.RLock()
+
+	def key(self, fname, aband):
+		'''Accepts file name and band number, returns cache key.'''
+		return os.path.abspath(fname), aband, rasterIO._filesignature(fname)
+
+	def get(self, fname, aband, progress=None):
+		'''Accepts gdal compatible file on disk, band number and optional progress function (see rasterIO.readrasterband),
+		returns band as Numpy masked array.'''
+		key = self.key(fname, aband)
+		self.lock.acquire()
+		try:
+			if key in self.bands:
+				self.order.remove(key)
+				self.order.append(key)
+				rasterProfile.count('cache hits')
+				return self.bands[key][0]
+			if key in self.spilled:
+				rasterProfile.count('cache spill restores')
+				raster = self._restore(key)
+			else:
+				rasterProfile.count('cache misses')
+				raster = rasterIO.readrasterband(rasterIO.openpooledraster(fname), aband, progress=progress)
+			self._add(key, raster)
+			return raster
+		finally:
+			self.lock.release()
+
+	def _add(self, key, raster):
+		nbytes = rastersize(raster)
+		# make space for the band, a band larger than the budget is kept until the next band is added
+		while len(self.order) > 0 and self.inmemory + nbytes > self.budget:
+			self.evict(self.order[0])
+		self.bands[key] = (raster, nbytes)
+		self.order.append(key)
+		self.inmemory += nbytes
+
+	def evict(self, key):
+		'''Accepts cache key and removes the band from memory, spilling it to disk if enabled.'''
+		self.lock.acquire()
+		try:
+			raster, nbytes = self.bands.pop(key)
+			self.order.remove(key)
+			self.inmemory -= nbytes
+			if self.spill and key not in self.spilled:
+				self._spill(key, raster)
+		finally:
+			self.lock.release()
+
+	def _spill(self, key, raster):
+		if self.spilldir == None:
+			self.spilldir = tempfile.mkdtemp(prefix='rasterCache_')
+		base = os.path.join(self.spilldir, 'band_%i' % len(os.listdir(self.spilldir)))
+		np.save(base + '_data.npy', ma.getdata(raster))
+		maskfile = None
+		if ma.getmask(raster) is not ma.nomask:
+			maskfile = base + '_mask.npy'
+			np.save(maskfile, ma.getmask(raster))
+		self.spilled[key] = (base + '_data.npy', maskfile, ma.MaskedArray(raster).fill_value)
+
+	def _restore(self, key):
+		datafile, maskfile, fill_value = self.spilled[key]
+		data = np.load(datafile, mmap_mode='r')
+		mask = ma.nomask
+		if maskfile != None:
+			mask = np.load(maskfile, mmap_mode='r')
+		return ma.array(data, mask=mask, fill_value=fill_value, copy=False)
+
+	def usage(self):
+		'''Returns bytes of bands in memory, memory budget, number of bands in memory and number of spilled bands.'''
+		return self.inmemory, self.budget, len(self.order), len(self.spilled)
+
+	def clear(self):
+		'''Removes all bands from the cache and deletes spill files.'''
+		self.lock.acquire()
+		try:
+			self.bands.clear()
+			del self.order[:]
+			self.spilled.clear()
+			self.inmemory = 0
+			if self.spilldir != None and os.path.isdir(self.spilldir):
+				shutil.rmtree(self.spilldir, True)
+			self.spilldir = None
+		finally:
+			self.lock.release()
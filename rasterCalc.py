@@ -0,0 +1,968 @@
+''' Library of functions to evaluate raster calculator equations on Numpy masked arrays.
+
+rasterCalc
+==========
+
+This library contains the functions used by the Raster Processing Suite calculator to evaluate
+equations (e.g. "(b2 - b1) / (b2 + b1)") on raster bands held as Numpy masked arrays.
+
+Streaming
+---------
+	Pixel-wise equations can be evaluated one tile (group of rows) at a time and each tile written
+	to the output file as soon as it has been calculated, so memory used by the calculation is bounded
+	by the tile size rather than the raster size. Global statistics (mean, std) are calculated
+	before the first tile. Equations using indexing or other functions which need a whole band are not
+	streamable and must be evaluated on the whole band.
+
+	>>> import rasterCalc
+	>>> if rasterCalc.streamable(eqstring, namespace):
+	...	rasterCalc.writetiles(eqstring, namespace, outfile, 'GTiff', XSize, YSize, geotrans, epsg)
+
+	writeparallel reads and calculates tiles on a pool of threads, writing them in order from the
+	calling thread, and can read bands from disk tile by tile for rasters larger than memory.
+	summarize calculates statistics, percentiles and a histogram of the result tile by tile, without
+	creating the whole result (see rasterStats.Summary).
+
+Preview
+-------
+	preview evaluates an equation on bands decimated to at most rasterIO.PREVIEW_SIZE pixels across, read
+	from overviews or decimated by GDAL, for a quick look at the result before the full resolution run.
+	Statistics (mean, std) in previews are of the decimated bands.
+
+	>>> quicklook = rasterCalc.preview("(b2 - b1) / (b2 + b1)", namespace, sources)
+
+Compiler
+--------
+	Equations are compiled to an expression tree before evaluation. Constant terms are folded,
+	repeated terms (common sub-expressions) are calculated once, and the operators are evaluated
+	together on small (cache sized) chunks of the bands using preallocated buffers, rather than
+	creating a full size temporary array for every operator.
+	Global statistics (mean(b1), std(b1) or ma.mean(b1), ma.std(b1)) are calculated once, in a single pass,
+	when the equation is compiled (see rasterStats).
+	Equations the compiler does not support are evaluated by Python's eval, as are all equations with
+	Python 2.5 (the compiler needs the ast module of Python 2.6 or greater).
+
+	>>> newband = rasterCalc.evaluate("(b2 - b1) / (b2 + b1)", namespace)
+
+	Invalid equations raise rasterCalc.EquationError (a ValueError), with a message describing the problem.
+
+Datatypes
+---------
+	Bands keep their native datatype (e.g. uint8, uint16) and the datatype of each operation is chosen
+	from the range of values its operands can hold, rather than by numpy's rules (which wrap around on
+	integer overflow):
+		- add, subtract, multiply, negative, abs, maximum, minimum, mod and power (by a whole, positive
+		  constant) of integers give the smallest integer datatype holding all possible results, e.g.
+		  uint8 + uint8 is uint16 and uint16 - uint16 is int32. Results needing more than 32 bits are float64.
+		- division, sqrt, log, exp and other functions of integers give float32, or float64 if an operand
+		  is float64 or an integer float32 can not hold exactly (e.g. int32).
+		- floor and ceil of integers are the integers themselves, comparisons give booleans.
+	Equations evaluated by eval use Float32 copies of integer bands.
+	/ is true division in all equations, as with 'from __future__ import division' (1 / 2 is 0.5).
+
+Profiling
+---------
+	Compiling, evaluation (compiled or by eval), re-masking of NoDataValues and tiles are timed and counted
+	by rasterProfile when it is enabled.
+
+License
+-------
+Released under the Simplified BSD License (see LICENSE.txt).
+'''
+__version__ = "1.0.0"
+#!/usr/bin/env python
+import sys, threading, Queue, __future__
+try:
+	import ast
+except ImportError:
+	# Python 2.5, equations are evaluated by eval
+	ast = None
+import numpy as np
+import numpy.ma as ma
+import rasterIO
+import rasterStats
+import rasterProfile
+
+# number of rows in each tile when streaming equations
+TILE_ROWS = 256
+# NoDataValue of calculator output
+NODATA = 9999.0
+# number of pixels in each chunk evaluated by compiled equations
+CHUNK_PIXELS = 16384
+# number of threads used by writeparallel, None for one per CPU
+THREADS = None
+# modules which can be used in streamable equations
+MODULES = ('ma', 'np', 'numpy')
+# pixel-wise (element by element) functions which can be used in streamable equations
+ELEMENTWISE = ('sqrt', 'power', 'exp', 'log', 'log10', 'log2', 'abs', 'absolute', 'fabs',
+	'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan', 'arctan2', 'sinh', 'cosh', 'tanh',
+	'floor', 'ceil', 'around', 'round_', 'negative', 'add', 'subtract', 'multiply', 'divide',
+	'true_divide', 'floor_divide', 'mod', 'remainder', 'maximum', 'minimum', 'where',
+	'greater', 'greater_equal', 'less', 'less_equal', 'equal', 'not_equal',
+	'logical_and', 'logical_or', 'logical_not', 'logical_xor', 'masked_where', 'masked_invalid',
+	'masked_values', 'masked_equal', 'masked_greater', 'masked_less', 'masked_inside', 'masked_outside')
+
+# binary operators supported by the compiler, with flag for commutative operators
+BINARY = {'Add':(np.add, True), 'Sub':(np.subtract, False), 'Mult':(np.multiply, True),
+	'Div':(np.true_divide, False), 'Pow':(np.power, False), 'Mod':(np.mod, False)}
+# comparison operators supported by the compiler
+COMPARE = {'Gt':(np.greater, False), 'GtE':(np.greater_equal, False), 'Lt':(np.less, False),
+	'LtE':(np.less_equal, False), 'Eq':(np.equal, True), 'NotEq':(np.not_equal, True)}
+# functions supported by the compiler, with number of arguments and flag for commutative functions
+FUNCTIONS = {'sqrt':(np.sqrt, 1, False), 'exp':(np.exp, 1, False), 'log':(np.log, 1, False),
+	'log10':(np.log10, 1, False), 'abs':(np.absolute, 1, False), 'absolute':(np.absolute, 1, False),
+	'sin':(np.sin, 1, False), 'cos':(np.cos, 1, False), 'tan':(np.tan, 1, False),
+	'arctan':(np.arctan, 1, False), 'floor':(np.floor, 1, False), 'ceil':(np.ceil, 1, False),
+	'negative':(np.negative, 1, False), 'power':(np.power, 2, False),
+	'maximum':(np.maximum, 2, True), 'minimum':(np.minimum, 2, True)}
+# functions which reduce a band to a single value, calculated when the equation is compiled (see rasterStats)
+REDUCTIONS = ('mean', 'std')
+# operations with integer results for integer operands
+INTEGER_OPERATIONS = ('add', 'subtract', 'multiply', 'negative', 'absolute', 'maximum', 'minimum', 'remainder', 'power')
+# operations with boolean results
+COMPARISONS = ('greater', 'greater_equal', 'less', 'less_equal', 'equal', 'not_equal')
+# integer datatypes of results, in order of preference
+INTEGER_TYPES = (np.uint8, np.uint16, np.int16, np.uint32, np.int32)
+
+# exception raised for equations which can not be calculated
+class EquationError(ValueError):
+	'''Raised when an equation is invalid, the message describes the problem.'''
+	pass
+
+# exception raised for valid equations which the compiler does not support
+class UnsupportedError(EquationError):
+	'''Raised when an equation uses syntax or functions not supported by the compiler.'''
+	pass
+
+# compiled equation
+class Program:
+	'''Compiled equation, a list of operations on bands and constants evaluated chunk by chunk.
+
+	Operands are ('band', index) for input bands, ('reg', index) for the result of an operation
+	and ('const', value) for constants. Operations are (ufunc, name, operands, dtype, masked), where dtype
+	is the datatype the operation is calculated in (see Datatypes). valuerange is the (min, max) of integer
+	and boolean results, None for floating point results.'''
+
+	def __init__(self, eqstring, bands, operations, result, valuerange=None):
+		self.eqstring = eqstring
+		self.bands = bands
+		self.operations = operations
+		self.result = result
+		self.valuerange = valuerange
+
+	def evaluate(self, namespace, fill_value=NODATA, progress=None):
+		'''Accepts namespace holding the bands used by the equation, returns result as Numpy masked array.
+		progress is called with rows calculated and total rows after each row of chunks, and may raise an
+		exception to stop the calculation.
+
+		Masked pixels of results are set to fill_value, or the nearest value an integer result can hold (see rasterIO.fitnodata).'''
+		started = rasterProfile.start()
+		arrays = []
+		for name in self.bands:
+			if name not in namespace:
+				raise EquationError("'%s' is not loaded." % name)
+			arrays.append(namespace[name])
+		shape = arrays[0].shape
+		for i in range(len(arrays)):
+			if arrays[i].shape != shape:
+				raise EquationError("Input rasters are different sizes: '%s' is %i x %i, '%s' is %i x %i." %
+					(self.bands[0], shape[1], shape[0], self.bands[i], arrays[i].shape[1], arrays[i].shape[0]))
+		datas = [ma.getdata(a) for a in arrays]
+		masks = [ma.getmask(a) for a in arrays]
+		YSize, XSize = shape
+		# chunk of whole rows, or part of a row for very wide bands
+		ccols = min(XSize, CHUNK_PIXELS)
+		crows = max(1, CHUNK_PIXELS // ccols)
+		# preallocate chunk buffers for each operation
+		buffers = []
+		maskbuffers = []
+		for ufunc, name, operands, dtype, masked in self.operations:
+			buffers.append(np.empty((crows, ccols), dtype))
+			if masked:
+				maskbuffers.append(np.empty((crows, ccols), bool))
+			else:
+				maskbuffers.append(None)
+		# preallocate output
+		dtype, masked = self._describe(self.result, datas, masks)
+		outdata = np.empty(shape, dtype)
+		if masked:
+			outmask = np.zeros(shape, bool)
+		else:
+			outmask = ma.nomask
+		olderr = np.seterr(all='ignore')
+		try:
+			for r in range(0, YSize, crows):
+				for c in range(0, XSize, ccols):
+					h = min(crows, YSize - r)
+					w = min(ccols, XSize - c)
+					values = []
+					valuemasks = []
+					for i in range(len(self.operations)):
+						ufunc, name, operands, opdtype, opmasked = self.operations[i]
+						args = []
+						argmasks = []
+						for operand in operands:
+							value, valuemask = self._operand(operand, datas, masks, values, valuemasks, r, c, h, w)
+							args.append(value)
+							argmasks.append(valuemask)
+						out = buffers[i][:h,:w]
+						if opdtype.kind == 'b':
+							ufunc(*(args + [out]))
+						else:
+							# calculate in the datatype of the result, so integers do not overflow
+							ufunc(*(args + [out]), **{'dtype':opdtype})
+						outm = None
+						if opmasked:
+							outm = maskbuffers[i][:h,:w]
+							_domain(name, args, out, outm)
+							for m in argmasks:
+								if m is not None:
+									np.logical_or(outm, m, outm)
+						values.append(out)
+						valuemasks.append(outm)
+					value, valuemask = self._operand(self.result, datas, masks, values, valuemasks, r, c, h, w)
+					outdata[r:r+h,c:c+w] = value
+					if valuemask is not None:
+						outmask[r:r+h,c:c+w] = valuemask
+				if progress != None:
+					progress(min(r + crows, YSize), YSize)
+		finally:
+			np.seterr(**olderr)
+		if outdata.dtype.kind in 'iu':
+			fill_value = rasterIO.fitnodata(outdata.dtype, fill_value)
+		if masked and outdata.dtype.kind in 'iuf':
+			np.putmask(outdata, outmask, fill_value)
+		rasterProfile.stop('evaluate', started, outdata.nbytes, outdata.size)
+		return ma.array(outdata, mask=outmask, fill_value=fill_value)
+
+	def _operand(self, operand, datas, masks, values, valuemasks, r, c, h, w):
+		'''Returns value and mask (or None) of an operand for the chunk at row r, column c.'''
+		kind, index = operand
+		if kind == 'const':
+			return index, None
+		elif kind == 'band':
+			if masks[index] is ma.nomask:
+				return datas[index][r:r+h,c:c+w], None
+			return datas[index][r:r+h,c:c+w], masks[index][r:r+h,c:c+w]
+		return values[index], valuemasks[index]
+
+	def _describe(self, operand, datas, masks):
+		'''Returns dtype and mask flag of an operand.'''
+		kind, index = operand
+		if kind == 'band':
+			return datas[index].dtype, masks[index] is not ma.nomask
+		return self.operations[index][3], self.operations[index][4]
+
+# function to set mask of pixels outside the domain of an operation
+def _domain(name, args, out, outm):
+	'''Accepts operation name, arguments, result and mask buffer, sets mask where result is undefined.'''
+	if name in ('true_divide', 'remainder'):
+		np.equal(args[1], 0, outm)
+	elif name == 'sqrt':
+		np.less(args[0], 0, outm)
+	elif name in ('log', 'log10'):
+		np.less_equal(args[0], 0, outm)
+	elif name == 'power':
+		np.isfinite(out, outm)
+		np.logical_not(outm, outm)
+	else:
+		outm[...] = False
+
+# function to get the range of values of a datatype
+def _typerange(dtype):
+	'''Accepts Numpy datatype, returns (min, max) of integer and boolean datatypes, None for other datatypes.'''
+	dt = np.dtype(dtype)
+	if dt.kind == 'b':
+		return 0, 1
+	elif dt.kind in 'iu':
+		info = np.iinfo(dt)
+		return int(info.min), int(info.max)
+	return None
+
+# function to get the range of values of an integer operation
+def _intrange(name, ranges, values):
+	'''Accepts operation name, (min, max) of operands and values of constant operands (None for arrays),
+	returns (min, max) of result, or None if the result is not an integer.'''
+	if name == 'negative':
+		lo, hi = ranges[0]
+		return -hi, -lo
+	elif name == 'absolute':
+		lo, hi = ranges[0]
+		if lo >= 0:
+			return lo, hi
+		elif hi <= 0:
+			return -hi, -lo
+		return 0, max(-lo, hi)
+	(alo, ahi), (blo, bhi) = ranges
+	if name == 'add':
+		return alo + blo, ahi + bhi
+	elif name == 'subtract':
+		return alo - bhi, ahi - blo
+	elif name == 'multiply':
+		products = [alo * blo, alo * bhi, ahi * blo, ahi * bhi]
+		return min(products), max(products)
+	elif name == 'maximum':
+		return max(alo, blo), max(ahi, bhi)
+	elif name == 'minimum':
+		return min(alo, blo), min(ahi, bhi)
+	elif name == 'remainder':
+		# result has the sign of the divisor and is smaller in magnitude
+		return min(0, blo + 1), max(0, bhi - 1)
+	elif name == 'power':
+		exponent = values[1]
+		if not isinstance(exponent, (int, long, np.integer)) or exponent < 0 or exponent > 64:
+			return None
+		powers = [alo ** exponent, ahi ** exponent]
+		if alo < 0 < ahi:
+			powers.append(0)
+		return min(powers), max(powers)
+	return None
+
+# function to get the datatype and range of values of an operation
+def _promote(name, dtypes, ranges, values):
+	'''Accepts operation name, datatypes (None for constants), (min, max) (None for floating point values) and
+	values of constant operands (None for arrays), returns datatype and (min, max) (None for floating point) of result.'''
+	if name in COMPARISONS:
+		return np.dtype(bool), (0, 1)
+	result = None
+	if None not in ranges and name in INTEGER_OPERATIONS:
+		result = _intrange(name, ranges, values)
+		if result != None:
+			# the datatype must also hold the operands, which are converted to it
+			lo = min([r[0] for r in ranges] + [result[0]])
+			hi = max([r[1] for r in ranges] + [result[1]])
+			for dtype in INTEGER_TYPES:
+				info = np.iinfo(dtype)
+				if lo >= info.min and hi <= info.max:
+					return np.dtype(dtype), result
+	# floating point result, float64 if float32 would lose precision of an operand or of an integer result
+	if result != None and max(abs(result[0]), abs(result[1])) > 2 ** 24:
+		return np.dtype(np.float64), None
+	for i in range(len(dtypes)):
+		if dtypes[i] != None and dtypes[i].kind == 'f' and dtypes[i].itemsize > 4:
+			return np.dtype(np.float64), None
+		if ranges[i] != None and max(abs(ranges[i][0]), abs(ranges[i][1])) > 2 ** 24:
+			return np.dtype(np.float64), None
+	return np.dtype(np.float32), None
+
+# class to compile an equation to a Program
+class _Compiler:
+	'''Builds the operations of a Program from the syntax tree of an equation.'''
+
+	def __init__(self, eqstring, namespace, sources=None, ondisk=()):
+		self.eqstring = eqstring
+		self.namespace = namespace
+		if sources == None:
+			sources = {}
+		self.sources = sources
+		# names of bands read from disk tile by tile, the namespace holds placeholders of them
+		self.ondisk = ondisk
+		self.bands = []
+		self.operations = []
+		# (min, max) of integer results of operations, None for floating point results
+		self.ranges = []
+		# operations already compiled, used to find common sub-expressions
+		self.cache = {}
+		self.bandmasks = {}
+
+	def compile(self):
+		if ast == None:
+			raise UnsupportedError('Equations are compiled with Python 2.6 or greater.')
+		started = rasterProfile.start()
+		try:
+			try:
+				tree = ast.parse(self.eqstring.strip(), '<equation>', 'eval')
+			except SyntaxError, e:
+				raise EquationError('Invalid syntax at character %s of equation.' % e.offset)
+			result = self.visit(tree.body)
+			if result[0] == 'const':
+				raise UnsupportedError('Equation does not use a raster band.')
+			return Program(self.eqstring, self.bands, self.operations, result, self.describe(result)[2])
+		finally:
+			rasterProfile.stop('compile', started)
+
+	def error(self, node, message):
+		raise UnsupportedError('%s (character %i of equation).' % (message, node.col_offset + 1))
+
+	def visit(self, node):
+		kind = node.__class__.__name__
+		if kind == 'Num':
+			return ('const', node.n)
+		elif kind == 'Name':
+			return self.name(node)
+		elif kind == 'BinOp':
+			opname = node.op.__class__.__name__
+			if opname not in BINARY:
+				self.error(node, 'Operator not supported')
+			ufunc, commutative = BINARY[opname]
+			return self.operation(ufunc, [self.visit(node.left), self.visit(node.right)], commutative)
+		elif kind == 'UnaryOp':
+			opname = node.op.__class__.__name__
+			operand = self.visit(node.operand)
+			if opname == 'UAdd':
+				return operand
+			elif opname == 'USub':
+				return self.operation(np.negative, [operand], False)
+			self.error(node, 'Operator not supported')
+		elif kind == 'Compare':
+			if len(node.ops) != 1:
+				self.error(node, 'Chained comparisons are not supported')
+			opname = node.ops[0].__class__.__name__
+			if opname not in COMPARE:
+				self.error(node, 'Comparison not supported')
+			ufunc, commutative = COMPARE[opname]
+			return self.operation(ufunc, [self.visit(node.left), self.visit(node.comparators[0])], commutative)
+		elif kind == 'Call':
+			return self.call(node)
+		self.error(node, 'Syntax not supported')
+
+	def name(self, node):
+		if node.id in ('True', 'False'):
+			return ('const', node.id == 'True')
+		if node.id not in self.namespace:
+			raise EquationError("'%s' is not a loaded raster band (character %i of equation)." % (node.id, node.col_offset + 1))
+		value = self.namespace[node.id]
+		if isinstance(value, np.ndarray):
+			if value.ndim != 2:
+				self.error(node, "'%s' is not a raster band" % node.id)
+			if node.id not in self.bands:
+				self.bands.append(node.id)
+			return ('band', self.bands.index(node.id))
+		if isinstance(value, (int, long, float, np.number)):
+			return ('const', value)
+		self.error(node, "'%s' is not a raster band or number" % node.id)
+
+	def call(self, node):
+		# functions may be called from a module (e.g. ma.sqrt) or directly
+		func = node.func
+		if func.__class__.__name__ == 'Attribute' and func.value.__class__.__name__ == 'Name' and func.value.id in MODULES:
+			fname = func.attr
+		elif func.__class__.__name__ == 'Name' and (func.id not in self.namespace or func.id in REDUCTIONS):
+			fname = func.id
+		elif func.__class__.__name__ == 'Name' and self.function(self.namespace[func.id]) != None:
+			# numpy function imported into the namespace (e.g. from numpy import sqrt)
+			fname = self.function(self.namespace[func.id])
+		else:
+			self.error(node, 'Function not supported')
+		if node.keywords or getattr(node, 'starargs', None) or getattr(node, 'kwargs', None):
+			self.error(node, 'Keyword arguments are not supported')
+		if fname in REDUCTIONS:
+			if len(node.args) != 1:
+				raise EquationError("%s() takes one argument (character %i of equation)." % (fname, node.col_offset + 1))
+			return self.reduction(fname, node.args[0])
+		if fname not in FUNCTIONS:
+			self.error(node, "Function '%s' not supported" % fname)
+		ufunc, nargs, commutative = FUNCTIONS[fname]
+		if len(node.args) != nargs:
+			raise EquationError("%s() takes %i argument(s) (character %i of equation)." % (fname, nargs, node.col_offset + 1))
+		return self.operation(ufunc, [self.visit(arg) for arg in node.args], commutative)
+
+	def function(self, value):
+		# name of a supported function, if value is its numpy ufunc or numpy.ma function
+		for fname in FUNCTIONS:
+			if value is FUNCTIONS[fname][0] or value is getattr(ma, fname, None):
+				return fname
+		return None
+
+	def reduction(self, fname, node):
+		# calculate the statistic of the argument now, it is a constant in the equation
+		stats = self.statistics(node)
+		if fname == 'mean':
+			if stats.count < 1:
+				return ('const', float('nan'))
+			return ('const', stats.mean)
+		return ('const', stats.std())
+
+	def statistics(self, node):
+		if node.__class__.__name__ == 'Name' and isinstance(self.namespace.get(node.id), np.ndarray):
+			# bands read from file are streamed from disk (and cached), others from memory
+			if node.id in self.sources:
+				fname, aband = self.sources[node.id]
+				return rasterStats.bandstats(fname, aband)
+			return rasterStats.arraystats(self.namespace[node.id])
+		for subnode in ast.walk(node):
+			if subnode.__class__.__name__ == 'Name' and subnode.id in self.ondisk:
+				self.error(node, 'Statistics of expressions of bands on disk are not supported')
+		argument = self.visit(node)
+		if argument[0] == 'const':
+			return rasterStats.arraystats(np.array([argument[1]], np.float64))
+		# evaluate the sub-expression on the whole band
+		return rasterStats.arraystats(Program(self.eqstring, self.bands, self.operations, argument).evaluate(self.namespace))
+
+	def operation(self, ufunc, operands, commutative):
+		# fold constant operations
+		constant = True
+		for operand in operands:
+			if operand[0] != 'const':
+				constant = False
+		if constant:
+			olderr = np.seterr(all='ignore')
+			try:
+				value = ufunc(*[operand[1] for operand in operands])
+			finally:
+				np.seterr(**olderr)
+			if not np.isfinite(value):
+				raise EquationError('Constant term of equation is not a number (e.g. division by zero).')
+			return ('const', value.item())
+		# floor and ceil of integers are the integers themselves
+		if ufunc in (np.floor, np.ceil) and self.describe(operands[0])[2] != None:
+			return operands[0]
+		# operands of commutative operations are sorted so that e.g. (b1 + b2) and (b2 + b1) are the same
+		if commutative:
+			operands = sorted(operands, key=repr)
+		key = (ufunc.__name__, tuple([(kind, value, type(value)) for kind, value in operands]))
+		if key in self.cache:
+			return ('reg', self.cache[key])
+		# get dtype of result from the datatypes and ranges of the operands (see Datatypes)
+		dtypes = []
+		ranges = []
+		values = []
+		masked = ufunc.__name__ in ('true_divide', 'remainder', 'sqrt', 'log', 'log10', 'power')
+		for operand in operands:
+			dtype, opmasked, oprange = self.describe(operand)
+			dtypes.append(dtype)
+			ranges.append(oprange)
+			values.append(None)
+			if operand[0] == 'const':
+				values[-1] = operand[1]
+			masked = masked or opmasked
+		dtype, result = _promote(ufunc.__name__, dtypes, ranges, values)
+		self.operations.append((ufunc, ufunc.__name__, operands, dtype, masked))
+		self.ranges.append(result)
+		self.cache[key] = len(self.operations) - 1
+		return ('reg', len(self.operations) - 1)
+
+	def describe(self, operand):
+		# datatype (None for constants), mask flag and (min, max) of integer values of an operand
+		kind, index = operand
+		if kind == 'const':
+			if isinstance(index, (bool, int, long, np.integer, np.bool_)):
+				return None, False, (int(index), int(index))
+			return None, False, None
+		elif kind == 'band':
+			band = self.namespace[self.bands[index]]
+			dtype = ma.getdata(band).dtype
+			return dtype, ma.getmask(band) is not ma.nomask, _typerange(dtype)
+		return self.operations[index][3], self.operations[index][4], self.ranges[index]
+
+# function to compile an equation
+def compileequation(eqstring, namespace, sources=None):
+	'''Accepts equation string, namespace and optional dict of band sources ({name:(file, band number)}),
+	returns compiled Program. Global statistics of bands with a source are read from disk (see rasterStats.bandstats).
+
+	Raises EquationError for invalid equations and UnsupportedError for equations the compiler does not support.'''
+	return _Compiler(eqstring, namespace, sources).compile()
+
+# function to evaluate an equation on whole bands
+def evaluate(eqstring, namespace, sources=None, progress=None):
+	'''Accepts equation string, namespace, optional dict of band sources and progress function (see Program.evaluate),
+	returns result of equation.
+
+	Equations which can not be compiled are evaluated by eval, without reporting progress.'''
+	try:
+		program = compileequation(eqstring, namespace, sources)
+	except UnsupportedError:
+		started = rasterProfile.start()
+		result = eval(_evalcode(eqstring), _floatbands(namespace, bandnames(eqstring, namespace)))
+		rasterProfile.stop('eval', started, 0, np.size(result))
+		return result
+	return program.evaluate(namespace, progress=progress)
+
+# function to compile an equation for eval
+def _evalcode(eqstring):
+	'''Accepts equation string, returns code object for eval, with true division as in compiled equations.'''
+	return compile(eqstring, '<equation>', 'eval', __future__.division.compiler_flag)
+
+# function to get namespace for equations evaluated by eval
+def _floatbands(namespace, names):
+	'''Accepts namespace and names of bands, returns copy of namespace with integer bands converted to Float32.'''
+	namespace = dict(namespace)
+	for name in names:
+		if namespace[name].dtype.kind in 'biu':
+			namespace[name] = namespace[name].astype(np.float32)
+	return namespace
+
+# function to get the names used by an equation
+def equationnames(eqstring):
+	'''Accepts equation string, returns names (variables, modules, functions and attributes) used by it.'''
+	try:
+		return compile(eqstring, '<equation>', 'eval').co_names
+	except SyntaxError:
+		return ()
+
+# function to get the names of bands (2D arrays) used by an equation
+def bandnames(eqstring, namespace):
+	'''Accepts equation string and namespace (dict of names available to the equation), returns list of band names used.'''
+	code = compile(eqstring, '<equation>', 'eval')
+	names = []
+	for name in code.co_names:
+		if name in namespace and isinstance(namespace[name], np.ndarray) and namespace[name].ndim == 2:
+			names.append(name)
+	return names
+
+# function to test whether an equation can be evaluated tile by tile
+def streamable(eqstring, namespace, sources=None):
+	'''Accepts equation string, namespace and optional dict of band sources, returns True if the equation is pixel-wise and uses at least one band.'''
+	try:
+		return len(compileequation(eqstring, namespace, sources).bands) > 0
+	except UnsupportedError:
+		pass
+	except EquationError:
+		return False
+	return _pixelwise(eqstring, namespace)
+
+# function to test whether an equation evaluated by eval is pixel-wise
+def _pixelwise(eqstring, namespace):
+	'''Accepts equation string and namespace, returns True if the equation only uses bands, modules and element-wise functions.'''
+	code = compile(eqstring, '<equation>', 'eval')
+	# indexing and slicing depend on the position of pixels in the whole band
+	if '[' in eqstring:
+		return False
+	bands = bandnames(eqstring, namespace)
+	for name in code.co_names:
+		if name not in bands and name not in MODULES and name not in ELEMENTWISE:
+			return False
+	return len(bands) > 0
+
+# function to evaluate an equation tile by tile
+def evaltiles(eqstring, namespace, tilerows=TILE_ROWS, shape=None, sources=None):
+	'''Accepts equation string, namespace, number of rows per tile, optional expected (YSize, XSize) of bands
+	and optional dict of band sources, returns generator of (window, tile) pairs, where window is
+	(xoff, yoff, xsize, ysize) and tile is the equation result for that window.
+
+	All bands used by the equation must have the same shape, otherwise EquationError is raised.'''
+	return _tiles(eqstring, namespace, tilerows, shape, sources)[1]
+
+# function to evaluate an equation tile by tile, with the range of its values
+def _tiles(eqstring, namespace, tilerows=TILE_ROWS, shape=None, sources=None):
+	'''Accepts arguments of evaltiles, returns (min, max) of integer results (None if not known, see Program.valuerange)
+	and generator of (window, tile) pairs.'''
+	bands, function, valuerange = _tilefunction(eqstring, namespace, sources)
+	YSize, XSize = namespace[bands[0]].shape
+	if shape != None and shape != (YSize, XSize):
+		raise EquationError("Input raster '%s' is %i x %i, output raster is %i x %i." % (bands[0], XSize, YSize, shape[1], shape[0]))
+	for name in bands:
+		if namespace[name].shape != (YSize, XSize):
+			raise EquationError("Input rasters are different sizes: '%s' is %i x %i, '%s' is %i x %i." %
+				(bands[0], XSize, YSize, name, namespace[name].shape[1], namespace[name].shape[0]))
+	def generate():
+		for yoff in range(0, YSize, tilerows):
+			ysize = min(tilerows, YSize - yoff)
+			# replace each band with a view of the rows in this tile
+			tiles = {}
+			for name in bands:
+				tiles[name] = namespace[name][yoff:yoff+ysize]
+			yield (0, yoff, XSize, ysize), function(tiles, (ysize, XSize))
+	return valuerange, generate()
+
+# function to summarise the result of an equation without creating the whole result
+def summarize(eqstring, namespace, sources=None, tilerows=TILE_ROWS, progress=None):
+	'''Accepts equation string, namespace, optional dict of band sources, number of rows per tile and progress
+	function (see writetiles), returns rasterStats.Summary of the result, or the result itself if it is not an array
+	(e.g. mean(b1)).
+
+	Pixel-wise equations are evaluated tile by tile and only the summary is kept. Other equations are evaluated
+	on whole bands.'''
+	if streamable(eqstring, namespace, sources):
+		summary = rasterStats.Summary()
+		YSize = namespace[bandnames(eqstring, namespace)[0]].shape[0]
+		for window, tile in evaltiles(eqstring, namespace, tilerows, sources=sources):
+			started = rasterProfile.start()
+			summary.add(tile)
+			rasterProfile.stop('stats', started, 0, tile.size)
+			if progress != None:
+				xoff, yoff, xsize, ysize = window
+				progress(yoff + ysize, YSize)
+		return summary
+	result = evaluate(eqstring, namespace, sources, progress)
+	if isinstance(result, np.ndarray) and result.ndim > 0:
+		return rasterStats.arraysummary(result)
+	return result
+
+# function to evaluate an equation on decimated bands
+def preview(eqstring, namespace, sources=None, size=None):
+	'''Accepts equation string, namespace, optional dict of band sources and largest preview dimension (default
+	rasterIO.PREVIEW_SIZE), returns result of equation evaluated on bands decimated to the preview size.
+
+	Bands in sources which are not in the namespace are read decimated from disk (see rasterIO.readrasterband),
+	bands in the namespace are decimated in memory.'''
+	if sources == None:
+		sources = {}
+	if size == None:
+		size = rasterIO.PREVIEW_SIZE
+	names = []
+	for name in equationnames(eqstring):
+		if name in namespace:
+			if isinstance(namespace[name], np.ndarray) and namespace[name].ndim == 2:
+				names.append(name)
+		elif name in sources:
+			names.append(name)
+	if len(names) < 1:
+		return evaluate(eqstring, namespace)
+	shapes = {}
+	for name in names:
+		if name in namespace:
+			shapes[name] = namespace[name].shape
+		else:
+			dataset = rasterIO.openpooledraster(sources[name][0])
+			shapes[name] = (dataset.RasterYSize, dataset.RasterXSize)
+	YSize, XSize = shapes[names[0]]
+	for name in names:
+		if shapes[name] != (YSize, XSize):
+			raise EquationError("Input rasters are different sizes: '%s' is %i x %i, '%s' is %i x %i." %
+				(names[0], XSize, YSize, name, shapes[name][1], shapes[name][0]))
+	outsize = rasterIO.previewsize(XSize, YSize, size)
+	previewspace = dict(namespace)
+	for name in names:
+		if name in namespace:
+			previewspace[name] = _decimate(namespace[name], outsize)
+		else:
+			fname, aband = sources[name]
+			previewspace[name] = rasterIO.readrasterband(rasterIO.openpooledraster(fname), aband, outsize=outsize)
+	return evaluate(eqstring, previewspace)
+
+# function to decimate a band in memory
+def _decimate(raster, outsize):
+	'''Accepts Numpy (masked) 2D-array and (xsize, ysize), returns array decimated to that size (nearest neighbour, as GDAL).'''
+	xsize, ysize = outsize
+	YSize, XSize = raster.shape
+	if (xsize, ysize) == (XSize, YSize):
+		return raster
+	rows = ((np.arange(ysize) + 0.5) * YSize / ysize).astype(np.intp)
+	cols = ((np.arange(xsize) + 0.5) * XSize / xsize).astype(np.intp)
+	return raster[rows][:, cols]
+
+# function to get the function evaluating an equation on one tile
+def _tilefunction(eqstring, namespace, sources=None, ondisk=(), pixelwise=False):
+	'''Accepts equation string, namespace, optional dict of band sources, names of bands read from disk and
+	flag to check that the equation is pixel-wise, returns (names of bands used, function accepting dict of
+	band tiles and tile shape, returning result tile, (min, max) of integer results or None if not known).'''
+	valuerange = None
+	try:
+		program = _Compiler(eqstring, namespace, sources, ondisk).compile()
+		bands = program.bands
+		valuerange = program.valuerange
+	except UnsupportedError:
+		if pixelwise and not _pixelwise(eqstring, namespace):
+			raise EquationError('Equation can not be calculated tile by tile.')
+		program = None
+		code = _evalcode(eqstring)
+		bands = bandnames(eqstring, namespace)
+	if len(bands) < 1:
+		raise TypeError
+	def function(tiles, shape):
+		rasterProfile.count('tiles')
+		if program != None:
+			tile = program.evaluate(tiles)
+		else:
+			started = rasterProfile.start()
+			tile = eval(code, namespace, _floatbands(tiles, bands))
+			rasterProfile.stop('eval', started, 0, np.size(tile))
+		if not isinstance(tile, np.ndarray) or tile.shape != shape:
+			raise ValueError
+		return tile
+	return bands, function, valuerange
+
+# function to evaluate an equation tile by tile, writing each tile to a new file
+def writetiles(eqstring, namespace, outfile, format, aXSize, aYSize, geotrans, epsg, tilerows=TILE_ROWS, sources=None, compress=None, dtype=None, progress=None):
+	'''Accepts equation string, namespace, outputfile string, format, geotranslation metadata, compression,
+	output datatype (see rasterIO.writeparams) and progress function, evaluates equation tile by tile and writes
+	result to file on disk. progress is called with tiles written and total tiles after each tile, and may raise
+	an exception to stop the calculation.
+
+	Pixel values are identical to evaluating the whole equation and writing it with rasterIO.writerasterband.
+	As the whole result is not known when the file is created, integer results ('Auto' or 'Smallest' datatype)
+	are written in the smallest datatype holding every value the equation can give and a NoDataValue outside
+	those values, 9999 where possible (e.g. Byte results are written as UInt16), see _nodatatype.
+	If the calculation fails the partially written file is removed.'''
+	writer = None
+	try:
+		valuerange, tiles = _tiles(eqstring, namespace, tilerows, (aYSize, aXSize), sources)
+		for window, tile in tiles:
+			xoff, yoff, xsize, ysize = window
+			if tile.dtype.kind == 'f':
+				started = rasterProfile.start()
+				tile = ma.masked_values(tile, NODATA)
+				rasterProfile.stop('remask', started, 0, tile.size)
+			if writer == None:
+				writer = _tilewriter(tile, outfile, format, aXSize, aYSize, geotrans, epsg, compress, dtype, valuerange)
+			writer.write(tile, xoff, yoff)
+			if progress != None:
+				progress(yoff // tilerows + 1, (aYSize + tilerows - 1) // tilerows)
+		if writer != None:
+			writer.close()
+	except:
+		# remove partial output
+		if writer != None:
+			writer.abort()
+		raise
+
+# function to get the datatype and NoDataValue of an integer result
+def _nodatatype(valuerange, NoDataVal=NODATA):
+	'''Accepts (min, max) of an integer result and preferred NoDataValue, returns the smallest GDAL datatype holding
+	the result and a NoDataValue outside (min, max), NoDataVal where possible, so no valid pixel can be NoData.'''
+	lo, hi = int(valuerange[0]), int(valuerange[1])
+	candidates = [hi + 1, lo - 1]
+	if NoDataVal < lo or NoDataVal > hi:
+		candidates.insert(0, int(NoDataVal))
+	for gdal_dtype in rasterIO.SMALLEST_TYPES:
+		tmin, tmax = _typerange(rasterIO.GDAL_NUMPY_TYPES[gdal_dtype])
+		if tmin <= lo and hi <= tmax:
+			for value in candidates:
+				if tmin <= value <= tmax:
+					return gdal_dtype, value
+	return rasterIO.GDT_Float64, float(candidates[0])
+
+# function to create the writer of an equation result from its first tile
+def _tilewriter(tile, outfile, format, aXSize, aYSize, geotrans, epsg, compress=None, dtype=None, valuerange=None):
+	'''Accepts first tile of result, outputfile string, format, geotranslation metadata, compression, output
+	datatype and (min, max) of integer results (default the range of the tile's datatype), returns
+	rasterIO.RasterWriter for the result.'''
+	if dtype == 'Smallest':
+		dtype = None
+	if dtype == None and tile.dtype.kind in 'iu':
+		# any value the equation can give may be a valid pixel of a later tile
+		if valuerange == None:
+			valuerange = _typerange(tile.dtype)
+		gdal_dtype, NoDataVal = _nodatatype(valuerange)
+	else:
+		gdal_dtype, NoDataVal = rasterIO.writeparams(tile, dtype)
+	return rasterIO.RasterWriter(outfile, format, aXSize, aYSize, geotrans, epsg, 1, gdal_dtype, NoDataVal, compress)
+
+# function to get number of threads used by writeparallel
+def _threadcount(threads=None):
+	'''Accepts number of threads or None, returns number of threads (one per CPU if None).'''
+	if threads == None:
+		threads = THREADS
+	if threads == None:
+		try:
+			import multiprocessing
+			threads = multiprocessing.cpu_count()
+		except (ImportError, NotImplementedError):
+			threads = 2
+	return max(1, threads)
+
+# function to evaluate an equation on a thread pool, writing each tile to a new file in order
+def writeparallel(eqstring, namespace, outfile, format, aXSize, aYSize, geotrans, epsg, sources=None, threads=None, tilerows=TILE_ROWS, compress=None, dtype=None, progress=None):
+	'''Accepts equation string, namespace, outputfile string, format, geotranslation metadata, optional dict of
+	band sources ({name:(file, band number)}), number of threads (default THREADS, one per CPU), number of rows per
+	tile, compression, output datatype and progress function (see writetiles), evaluates equation tile by tile on a
+	pool of threads and writes result to file on disk.
+
+	Bands in the namespace are read from memory. Bands in sources which are not in the namespace are read from
+	disk, tile by tile, each thread using its own dataset handles, so rasters larger than memory can be processed.
+	Tiles are read and calculated in parallel (GDAL and Numpy release the GIL) and written by the calling thread
+	in order, one at a time. At most two tiles per thread are held in memory. Output is identical to writetiles.
+	If the calculation fails the partially written file is removed.
+
+	>>> rasterCalc.writeparallel("(b2 - b1) / (b2 + b1)", {}, outfile, 'GTiff', XSize, YSize, geotrans, epsg,
+	...	sources={'b1':('/data/scene.tif', 1), 'b2':('/data/scene.tif', 2)}, threads=8)'''
+	if sources == None:
+		sources = {}
+	# placeholders of bands on disk, for compiling the equation
+	ondisk = []
+	compilespace = dict(namespace)
+	for name in equationnames(eqstring):
+		if name in sources and name not in namespace:
+			fname, aband = sources[name]
+			dataset = rasterIO.openpooledraster(fname)
+			if dataset.RasterCount < aband:
+				raise EquationError("'%s' is not a band of %s." % (name, fname))
+			if (dataset.RasterYSize, dataset.RasterXSize) != (aYSize, aXSize):
+				raise EquationError("Input raster '%s' is %i x %i, output raster is %i x %i." %
+					(name, dataset.RasterXSize, dataset.RasterYSize, aXSize, aYSize))
+			dt = rasterIO.GDAL_NUMPY_TYPES.get(dataset.GetRasterBand(aband).DataType, np.float32)
+			compilespace[name] = ma.array(np.zeros((1, 1), dt), mask=np.zeros((1, 1), bool))
+			ondisk.append(name)
+	bands, function, valuerange = _tilefunction(eqstring, compilespace, sources, ondisk, True)
+	for name in bands:
+		if name not in ondisk and namespace[name].shape != (aYSize, aXSize):
+			raise EquationError("Input raster '%s' is %i x %i, output raster is %i x %i." %
+				(name, namespace[name].shape[1], namespace[name].shape[0], aXSize, aYSize))
+	windows = [(0, yoff, aXSize, min(tilerows, aYSize - yoff)) for yoff in range(0, aYSize, tilerows)]
+	threads = min(_threadcount(threads), len(windows))
+	tasks = Queue.Queue()
+	for i in range(len(windows)):
+		tasks.put(i)
+	# results of tiles by index, and errors raised by threads
+	results = {}
+	errors = []
+	done = threading.Condition()
+	# limit number of tiles calculated but not yet written
+	slots = threading.Semaphore(2 * threads)
+	stop = []
+
+	def work():
+		# each thread has its own dataset handles, GDAL datasets can not be shared between threads
+		datasets = {}
+		try:
+			while len(stop) < 1:
+				slots.acquire()
+				if len(stop) > 0:
+					break
+				try:
+					i = tasks.get_nowait()
+				except Queue.Empty:
+					slots.release()
+					break
+				xoff, yoff, xsize, ysize = windows[i]
+				tiles = {}
+				for name in bands:
+					if name in ondisk:
+						fname, aband = sources[name]
+						if fname not in datasets:
+							datasets[fname] = rasterIO.opengdalraster(fname)
+						tiles[name] = rasterIO.readwindow(datasets[fname], aband, xoff, yoff, xsize, ysize)
+					else:
+						tiles[name] = namespace[name][yoff:yoff+ysize, xoff:xoff+xsize]
+				tile = function(tiles, (ysize, xsize))
+				if tile.dtype.kind == 'f':
+					started = rasterProfile.start()
+					tile = ma.masked_values(tile, NODATA)
+					rasterProfile.stop('remask', started, 0, tile.size)
+				done.acquire()
+				results[i] = tile
+				done.notify()
+				done.release()
+		except:
+			done.acquire()
+			errors.append(sys.exc_info())
+			done.notify()
+			done.release()
+
+	workers = [threading.Thread(target=work) for j in range(threads)]
+	for worker in workers:
+		worker.setDaemon(True)
+		worker.start()
+	writer = None
+	try:
+		# write tiles in order as they are calculated
+		for i in range(len(windows)):
+			done.acquire()
+			try:
+				while i not in results and len(errors) < 1:
+					done.wait(1.0)
+				if len(errors) > 0:
+					raise errors[0][0], errors[0][1], errors[0][2]
+				tile = results.pop(i)
+			finally:
+				done.release()
+			if writer == None:
+				writer = _tilewriter(tile, outfile, format, aXSize, aYSize, geotrans, epsg, compress, dtype, valuerange)
+			writer.write(tile, windows[i][0], windows[i][1])
+			slots.release()
+			if progress != None:
+				progress(i + 1, len(windows))
+		writer.close()
+	except:
+		stop.append(True)
+		# let blocked threads finish
+		for worker in workers:
+			slots.release()
+		for worker in workers:
+			worker.join()
+		if writer != None:
+			writer.abort()
+		raise
+	for worker in workers:
+		worker.join()
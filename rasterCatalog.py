@@ -0,0 +1,212 @@
+''' Library of functions to index directories of raster files in an SQLite database.
+
+rasterCatalog
+=============
+
+Metadata of raster files (driver, size, number of bands, datatype, NoDataValue, geotransform, EPSG code and
+bounding box) is read once and kept in an SQLite database, so batch scripts can find and plan work on the
+files without opening every file. Refreshing a catalog only reads files which are new or have been modified
+(by modification time and size) since they were indexed, and removes files which no longer exist.
+Band statistics (see rasterStats) are cached in the catalog when first requested.
+
+	>>> import rasterCatalog
+	>>> catalog = rasterCatalog.Catalog('/data/tiles/catalog.sqlite')
+	>>> updated, removed, failed = catalog.refresh('/data/tiles')
+	>>> for record in catalog.intersecting((400000, 300000, 410000, 310000), 27700):
+	...	print record.fname, record.XSize, record.YSize
+	>>> stats = catalog.stats(record.fname, 1)
+
+Bounding boxes are (xmin, ymin, xmax, ymax) in the coordinates of the file's geotransform.
+
+Dependencies
+------------
+sqlite3 (Python 2.5 or greater)
+
+License
+-------
+Released under the Simplified BSD License (see LICENSE.txt).
+'''
+__version__ = "1.0.0"
+#!/usr/bin/env python
+import os, fnmatch
+import sqlite3
+import rasterIO
+import rasterStats
+
+# file name patterns indexed by default
+PATTERNS = ('*.tif', '*.tiff', '*.img')
+# columns of the rasters table, in the order of Record attributes
+COLUMNS = ('fname', 'mtime', 'fsize', 'driver', 'XSize', 'YSize', 'bands', 'dtype', 'nodata',
+	'gt0', 'gt1', 'gt2', 'gt3', 'gt4', 'gt5', 'epsg', 'xmin', 'ymin', 'xmax', 'ymax')
+SCHEMA = ('''CREATE TABLE IF NOT EXISTS rasters (fname TEXT PRIMARY KEY, mtime REAL, fsize INTEGER, driver TEXT,
+		XSize INTEGER, YSize INTEGER, bands INTEGER, dtype TEXT, nodata REAL,
+		gt0 REAL, gt1 REAL, gt2 REAL, gt3 REAL, gt4 REAL, gt5 REAL, epsg INTEGER,
+		xmin REAL, ymin REAL, xmax REAL, ymax REAL)''',
+	'CREATE INDEX IF NOT EXISTS rasters_bbox ON rasters (epsg, xmin, xmax, ymin, ymax)',
+	'''CREATE TABLE IF NOT EXISTS bandstats (fname TEXT, band INTEGER, mtime REAL, count INTEGER,
+		mean REAL, M2 REAL, min REAL, max REAL, PRIMARY KEY (fname, band))''')
+
+# class to hold the metadata of a file
+class Record:
+	'''Metadata of a raster file: file name, modification time, file size, driver, XSize, YSize, number of bands,
+	datatype and NoDataValue of band 1, geotransform, EPSG code and bounding box.'''
+
+	def __init__(self, row):
+		for i in range(len(COLUMNS)):
+			setattr(self, COLUMNS[i], row[i])
+		self.geotrans = (self.gt0, self.gt1, self.gt2, self.gt3, self.gt4, self.gt5)
+		self.bbox = (self.xmin, self.ymin, self.xmax, self.ymax)
+
+# function to get the bounding box of a raster
+def boundingbox(geotrans, XSize, YSize):
+	'''Accepts geotransform and raster size, returns (xmin, ymin, xmax, ymax) of the raster's corners.'''
+	xs = []
+	ys = []
+	for col, row in ((0, 0), (XSize, 0), (0, YSize), (XSize, YSize)):
+		xs.append(geotrans[0] + col * geotrans[1] + row * geotrans[2])
+		ys.append(geotrans[3] + col * geotrans[4] + row * geotrans[5])
+	return min(xs), min(ys), max(xs), max(ys)
+
+# function to read the metadata of a file
+def readrecord(fname):
+	'''Accepts gdal compatible file on disk, returns tuple of column values (see COLUMNS).'''
+	stat = os.stat(fname)
+	dataset = rasterIO.opengdalraster(fname)
+	driver, XSize, YSize, proj, geotrans = rasterIO.readrastermeta(dataset)
+	dtype = None
+	nodata = None
+	if dataset.RasterCount > 0:
+		band = dataset.GetRasterBand(1)
+		dtype = rasterIO.gdal.GetDataTypeName(band.DataType)
+		nodata = band.GetNoDataValue()
+	epsg = None
+	if proj != None and len(proj) > 0:
+		try:
+			epsg = rasterIO.wkt2epsg(proj)
+		except (TypeError, ValueError):
+			pass
+	xmin, ymin, xmax, ymax = boundingbox(geotrans, XSize, YSize)
+	return ((os.path.abspath(fname), stat.st_mtime, stat.st_size, driver, XSize, YSize, dataset.RasterCount, dtype, nodata) +
+		tuple(geotrans) + (epsg, xmin, ymin, xmax, ymax))
+
+# class to index raster files
+class Catalog:
+	'''Index of raster files in the SQLite database dbfile (created if it does not exist).'''
+
+	def __init__(self, dbfile):
+		self.dbfile = dbfile
+		self.db = sqlite3.connect(dbfile)
+		self.db.text_factory = str
+		for statement in SCHEMA:
+			self.db.execute(statement)
+		self.db.commit()
+
+	def close(self):
+		'''Closes the database.'''
+		self.db.close()
+
+	def refresh(self, root, patterns=PATTERNS, recursive=True, progress=None):
+		'''Accepts directory, file name patterns, flag to include sub-directories and optional progress function
+		(called with files checked and total files), indexes new and modified files and removes files which
+		no longer exist, returns (number of files indexed, number of files removed, list of files which could
+		not be read).'''
+		files = []
+		for dirpath, dirnames, filenames in os.walk(root):
+			for filename in filenames:
+				for pattern in patterns:
+					if fnmatch.fnmatch(filename.lower(), pattern):
+						files.append(os.path.abspath(os.path.join(dirpath, filename)))
+						break
+			if not recursive:
+				break
+		known = {}
+		for fname, mtime, fsize in self.db.execute('SELECT fname, mtime, fsize FROM rasters'):
+			known[fname] = (mtime, fsize)
+		updated = 0
+		failed = []
+		for i in range(len(files)):
+			fname = files[i]
+			try:
+				stat = os.stat(fname)
+				if known.get(fname) != (stat.st_mtime, stat.st_size):
+					self.db.execute('INSERT OR REPLACE INTO rasters VALUES (%s)' % ', '.join(['?'] * len(COLUMNS)), readrecord(fname))
+					self.db.execute('DELETE FROM bandstats WHERE fname = ?', (fname,))
+					updated += 1
+			except (IOError, OSError):
+				failed.append(fname)
+			if progress != None:
+				progress(i + 1, len(files))
+		# remove files under root which have been deleted (or can no longer be read)
+		found = dict([(fname, True) for fname in files if fname not in failed])
+		prefix = os.path.join(os.path.abspath(root), '')
+		removed = 0
+		for fname in list(known.keys()):
+			if fname.startswith(prefix) and fname not in found and (recursive or os.path.dirname(fname) == prefix[:-1]):
+				self.remove(fname)
+				removed += 1
+		self.db.commit()
+		return updated, removed, failed
+
+	def remove(self, fname):
+		'''Accepts file name and removes it from the catalog.'''
+		fname = os.path.abspath(fname)
+		self.db.execute('DELETE FROM rasters WHERE fname = ?', (fname,))
+		self.db.execute('DELETE FROM bandstats WHERE fname = ?', (fname,))
+
+	def _select(self, where='', args=()):
+		cursor = self.db.execute('SELECT %s FROM rasters %s ORDER BY fname' % (', '.join(COLUMNS), where), args)
+		return [Record(row) for row in cursor]
+
+	def record(self, fname):
+		'''Accepts file name, returns Record of the file, or None if it is not in the catalog.'''
+		records = self._select('WHERE fname = ?', (os.path.abspath(fname),))
+		if len(records) < 1:
+			return None
+		return records[0]
+
+	def records(self, epsg=None):
+		'''Accepts optional EPSG code, returns list of Records of all files (with that EPSG code).'''
+		if epsg == None:
+			return self._select()
+		return self._select('WHERE epsg = ?', (epsg,))
+
+	def intersecting(self, bbox, epsg=None):
+		'''Accepts bounding box (xmin, ymin, xmax, ymax) and optional EPSG code, returns list of Records of files
+		whose bounding boxes intersect it (with that EPSG code).'''
+		xmin, ymin, xmax, ymax = bbox
+		where = 'WHERE xmax > ? AND xmin < ? AND ymax > ? AND ymin < ?'
+		args = (xmin, xmax, ymin, ymax)
+		if epsg != None:
+			where += ' AND epsg = ?'
+			args += (epsg,)
+		return self._select(where, args)
+
+	def extent(self, epsg=None):
+		'''Accepts optional EPSG code, returns bounding box (xmin, ymin, xmax, ymax) of all files (with that EPSG code),
+		or None if there are none.'''
+		where = ''
+		args = ()
+		if epsg != None:
+			where = 'WHERE epsg = ?'
+			args = (epsg,)
+		row = self.db.execute('SELECT MIN(xmin), MIN(ymin), MAX(xmax), MAX(ymax) FROM rasters %s' % where, args).fetchone()
+		if row[0] == None:
+			return None
+		return tuple(row)
+
+	def stats(self, fname, aband):
+		'''Accepts file name and band number, returns rasterStats.Stats of the band, calculated when first requested
+		(or when the file has been modified) and cached in the catalog.'''
+		fname = os.path.abspath(fname)
+		mtime = os.path.getmtime(fname)
+		row = self.db.execute('SELECT count, mean, M2, min, max FROM bandstats WHERE fname = ? AND band = ? AND mtime = ?',
+			(fname, aband, mtime)).fetchone()
+		stats = rasterStats.Stats()
+		if row != None:
+			stats.count, stats.mean, stats.M2, stats.min, stats.max = row
+			return stats
+		stats = rasterStats.bandstats(fname, aband)
+		self.db.execute('INSERT OR REPLACE INTO bandstats VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+			(fname, aband, mtime, stats.count, stats.mean, stats.M2, stats.min, stats.max))
+		self.db.commit()
+		return stats
@@ -10,24 +10,34 @@ in the standard Geospatial GeoTiff format.
 Notes
 -----
 	Error checking - rasterIO contains minimal user-level error checking.
+	Profiling - opening, reading, masking, writing and overviews are timed by rasterProfile when it is enabled.
 
 Supported Formats
 -----------------
 	Input: rasterIO supports reading any GDAL supported raster format
 	Output: rasterIO generates GeoTiff files by default (this can be modified in the code).
 		GeoTiffs are created with embedded binary header files containing geo information
+		GeoTiffs are tiled, and can be compressed (see rasterIO.RasterWriter)
+		Overviews (pyramids) can be added to written files, inside the file or in a .ovr file (see rasterIO.buildoverviews)
 
 Supported Datatypes
 -------------------
-	Raster IO supports Float32 and Int16 data types.
-	The default datatype is Float32. Boolean datasets use Int16 datatypes.
+	Raster IO supports Byte, UInt16, Int16, UInt32, Int32, Float32 and Float64 data types.
+	Bands are read in their native datatype (e.g. a Byte band is read as a uint8 array) unless a datatype
+	is requested, and arrays are written in their own datatype unless an output datatype is chosen
+	(see rasterIO.writeparams). Boolean datasets use Byte datatypes.
 	
 NoDataValue
 -----------
 	If the input data has no recognisable NoDataValue (readable by GDAL) then the input NoDataValue
 	is assumed to be  0. Note that this could result in loss of data. It is left to the user to define
 	a suitable input NoDataValue.
+	Bands with a GDAL mask band (alpha band, per-dataset or .msk mask) are masked using the mask band.
+	NoDataValues are matched exactly and NaN values of floating point bands are masked. Bands without
+	invalid pixels have no mask (numpy.ma.nomask).
 	In accordance with GDAL the output data NoDataValue is 9999 or 9999.0
+	Outputs in datatypes which can not hold 9999 (e.g. Byte) use the maximum (or minimum) value of the datatype
+	(see rasterIO.fitnodata and rasterIO.smallesttype).
 
 How to use documentation
 ------------------------
@@ -68,7 +78,7 @@ Use the rasterIO module to convert Numpy arrays to/from Geospatial raster data f
 Dependencies
 ------------
 Python 2.5 or greater
-Numerical python (Numpy) 1.2.1 or greater
+Numerical python (Numpy) 1.6.0 or greater (numpy.result_type, numpy.bincount with minlength)
 
 License & Authors
 -----------------
@@ -96,21 +106,103 @@ __version__ = "1.0.1"
 # 05/11/2010 - TH - opengdalraster - Added exception, raising IOError if opening broken raster.
 # 10/11/2010 - TH - Added exceptions, raising errors where appropriate.
 # 10/11/2010 - TH - Marked this as version 1.0.1 - working.
-import os, sys, struct
+# 17/10/2026 - readrasterband - Read block-aligned strips straight into the output array (no per-pixel unpacking).
+# 17/10/2026 - Added readwindow, blockwindows and iterblocks for windowed (tile by tile) access to bands.
+# 17/10/2026 - Added createrasterband and writewindow for writing output tile by tile.
+# 17/10/2026 - Replaced createrasterband and writewindow with RasterWriter (tiled, compressed, multi-band output).
+#		writerasterband uses RasterWriter, masked pixels are written as NoDataVal.
+# 17/10/2026 - Added openpooledraster and invalidateraster, a least recently used pool of open datasets.
+# 17/10/2026 - Added mmaprasterband, zero-copy memory mapped reads of uncompressed rasters.
+# 17/10/2026 - Added readrasterbands, reading several bands in one pass.
+# 17/10/2026 - Bands are read and written in their native datatype (Byte to Float64), with optional dtype.
+#		Added output datatype selection (writeparams, smallesttype) and NoDataValues fitted to the datatype.
+# 17/10/2026 - Masking uses GDAL mask bands and exact NoDataValue matches, strip by strip, without copying.
+#		Reading a band without a NoDataValue no longer sets its NoDataValue to 0.
+# 17/10/2026 - Added Prefetcher, reading windows of bands ahead in a background thread.
+# 17/10/2026 - readrasterband - Added outsize, decimated reads (using overviews) for previews, and previewsize.
+# 17/10/2026 - Added buildoverviews, internal or external (.ovr) overviews of written files.
+# 17/10/2026 - wkt2epsg and new epsg2wkt are memoized, writers accept WKT or osr.SpatialReference as well as EPSG codes
+#		(see projectionwkt), so custom projections are written unchanged.
+# 17/10/2026 - Opening, reading, masking, writing and building overviews are timed by rasterProfile when it is enabled.
+import os, sys, threading
 import numpy as np
 import numpy.ma as ma
 import osgeo.osr as osr
 import osgeo.gdal as gdal
 from osgeo.gdalconst import *
+import rasterProfile
 #
 # function to open GDAL raster dataset
 def opengdalraster(fname):
 	'''Accepts gdal compatible file on disk and returns gdal pointer.'''
+	started = rasterProfile.start()
 	dataset = gdal.Open( fname, GA_ReadOnly)
+	rasterProfile.stop('open', started)
 	if dataset != None:
 		return dataset
 	else: 
 		raise IOError
+
+# maximum number of datasets kept open by openpooledraster
+POOL_SIZE = 16
+# pool of open datasets, key is file name, value is (file modification time and size, dataset)
+_pool = {}
+# file names in pool, least recently used first
+_poolorder = []
+_poollock = threading.Lock()
+#
+# function to get file signature used to detect changes to pooled files
+def _filesignature(fname):
+	'''Accepts file name, returns (modification time, size) or None if fname is not a file on disk (e.g. GDAL virtual file).'''
+	if os.path.isfile(fname):
+		stat = os.stat(fname)
+		return stat.st_mtime, stat.st_size
+	return None
+
+# function to open GDAL raster dataset from a pool of open datasets
+def openpooledraster(fname):
+	'''Accepts gdal compatible file on disk and returns read-only gdal pointer, shared with other callers.
+
+	Datasets are kept open (up to POOL_SIZE, least recently used are closed first) so repeated opens of the
+	same file reuse the open dataset and GDAL's block cache. Files modified since they were opened are re-opened.
+	Pooled datasets must not be used by more than one thread at a time.'''
+	key = os.path.abspath(fname)
+	signature = _filesignature(fname)
+	_poollock.acquire()
+	try:
+		if key in _pool:
+			_poolorder.remove(key)
+			if _pool[key][0] == signature:
+				_poolorder.append(key)
+				rasterProfile.count('pool hits')
+				return _pool[key][1]
+			del _pool[key]
+		rasterProfile.count('pool misses')
+		dataset = opengdalraster(fname)
+		_pool[key] = (signature, dataset)
+		_poolorder.append(key)
+		# close least recently used datasets
+		while len(_poolorder) > POOL_SIZE:
+			del _pool[_poolorder.pop(0)]
+		return dataset
+	finally:
+		_poollock.release()
+
+# function to close pooled datasets
+def invalidateraster(fname=None):
+	'''Accepts file name and closes its pooled dataset, closes all pooled datasets if fname is None.'''
+	_poollock.acquire()
+	try:
+		if fname == None:
+			_pool.clear()
+			del _poolorder[:]
+		else:
+			key = os.path.abspath(fname)
+			if key in _pool:
+				del _pool[key]
+				_poolorder.remove(key)
+	finally:
+		_poollock.release()
 		
 # function to read raster image metadata
 def readrastermeta(dataset):
@@ -133,93 +225,909 @@ def readrastermeta(dataset):
 	
 	return driver_short, XSize, YSize, proj_wkt, geotransform
 
+# numpy datatypes of GDAL datatypes
+GDAL_NUMPY_TYPES = {GDT_Byte:np.uint8, GDT_UInt16:np.uint16, GDT_Int16:np.int16, GDT_UInt32:np.uint32,
+	GDT_Int32:np.int32, GDT_Float32:np.float32, GDT_Float64:np.float64}
+# GDAL datatypes by name, used to choose the datatype of output rasters
+GDAL_TYPE_NAMES = {'Byte':GDT_Byte, 'UInt16':GDT_UInt16, 'Int16':GDT_Int16, 'UInt32':GDT_UInt32,
+	'Int32':GDT_Int32, 'Float32':GDT_Float32, 'Float64':GDT_Float64}
+#
+# function to get GDAL datatype able to hold a numpy datatype
+def gdaltype(dtype):
+	'''Accepts Numpy datatype, returns GDAL datatype used to store it.
+
+	Boolean and Int8 arrays are stored as Byte and Int16, 64 bit integers as Float64 and other types as Float32.'''
+	dt = np.dtype(dtype)
+	for gdal_dtype in GDAL_NUMPY_TYPES:
+		if np.dtype(GDAL_NUMPY_TYPES[gdal_dtype]) == dt:
+			return gdal_dtype
+	if dt.kind == 'b':
+		return GDT_Byte
+	elif dt.kind in 'iu' and dt.itemsize == 1:
+		return GDT_Int16
+	elif dt.kind in 'iu' or dt.itemsize > 4:
+		return GDT_Float64
+	return GDT_Float32
+
+# function to get numpy and GDAL datatypes used to read a band
+def _readtype(band, dtype=None):
+	'''Accepts GDAL raster band and optional Numpy datatype, returns (Numpy datatype, GDAL datatype) of the read buffer.
+
+	By default bands are read in their native datatype, bands of types Numpy can not read directly (e.g. complex) as Float32.'''
+	if dtype == None:
+		if band.DataType in GDAL_NUMPY_TYPES:
+			return np.dtype(GDAL_NUMPY_TYPES[band.DataType]), band.DataType
+		return np.dtype(np.float32), GDT_Float32
+	dt = np.dtype(dtype)
+	gdal_dtype = gdaltype(dt)
+	if np.dtype(GDAL_NUMPY_TYPES[gdal_dtype]) != dt:
+		raise TypeError
+	return dt, gdal_dtype
+
+# target size of a single read request in bytes
+READ_CHUNK_BYTES = 4194304
+#
+# function to get number of rows read per request, a multiple of the band's native block height
+def _striprows(band, xsize, itemsize):
+	'''Accepts GDAL raster band, strip width and pixel size in bytes, returns number of rows to read per strip.'''
+	blockrows = band.GetBlockSize()[1]
+	if blockrows < 1:
+		blockrows = 1
+	nblocks = READ_CHUNK_BYTES // (blockrows * xsize * itemsize)
+	return min(max(nblocks, 1) * blockrows, band.YSize)
+
+# function to get default tile size for a band, aligned to the band's native blocks
+def _tilesize(band, itemsize):
+	'''Accepts GDAL raster band and pixel size in bytes, returns (xsize, ysize) of default tile.'''
+	blockcols, blockrows = band.GetBlockSize()
+	if blockcols < 1 or blockcols >= band.XSize:
+		# striped layout, use full width strips
+		return band.XSize, _striprows(band, band.XSize, itemsize)
+	# tiled layout, use a row of whole blocks
+	nblocks = READ_CHUNK_BYTES // (blockcols * blockrows * itemsize)
+	return min(max(nblocks, 1) * blockcols, band.XSize), min(blockrows, band.YSize)
+
+# function to get how invalid pixels of a band are identified
+def _maskinfo(band):
+	'''Accepts GDAL raster band, returns (NoDataValue, mask band).
+
+	Bands with a GDAL mask (per-dataset or .msk mask, or alpha band) return (None, mask band). Other bands return
+	(NoDataValue, None), where the NoDataValue is 0 if the band has none. The band is not modified.'''
+	try:
+		flags = band.GetMaskFlags()
+	except AttributeError:
+		# GDAL without mask band support
+		flags = GMF_NODATA
+	if flags & (GMF_ALL_VALID | GMF_NODATA) == 0:
+		return None, band.GetMaskBand()
+	NoDataVal = band.GetNoDataValue()
+	if NoDataVal == None:
+		NoDataVal = 0
+		#print "Warning NoDataValue not found, assuming 0!".format(dataset,aband)
+	return NoDataVal, None
+
+# function to read a window of a band into an array
+def _readarray(band, xoff, yoff, xsize, ysize, dtype=None, progress=None, outsize=None):
+	'''Accepts GDAL raster band, window, optional Numpy datatype, progress function (called with rows read and
+	total rows after each strip) and output (xsize, ysize), returns Numpy 2D-array (native datatype by default).
+
+	If outsize is given the window is decimated (nearest neighbour) to that size in a single request, GDAL reads
+	from the band's overviews where they are available.'''
+	dt, gdal_dtype = _readtype(band, dtype)
+	started = rasterProfile.start()
+	if outsize != None and outsize != (xsize, ysize):
+		bufxsize, bufysize = outsize
+		data = band.ReadRaster( xoff, yoff, xsize, ysize, bufxsize, bufysize, gdal_dtype)
+		datarray = np.frombuffer(data, dtype=dt).reshape(bufysize, bufxsize).copy()
+		rasterProfile.stop('read', started, datarray.nbytes, datarray.size)
+		if progress != None:
+			progress(bufysize, bufysize)
+		return datarray
+	# create empty array to hold extracted data [note Y,X format]
+	datarray = np.empty( ( ysize,xsize ), dtype=dt )
+		# create loop based on strips of whole blocks (i.e. groups of rows)
+	nrows = _striprows(band, xsize, dt.itemsize)
+	for i in range(0, ysize, nrows):
+		nlines = min(nrows, ysize - i)
+		# read strip of band as binary of the buffer datatype
+		strip = band.ReadRaster( xoff, yoff+i, xsize, nlines, xsize, nlines, gdal_dtype)
+		# view binary strip as array (no unpacking to Python objects) and copy into image array
+		datarray[i:i+nlines,:] = np.frombuffer(strip, dtype=dt).reshape(nlines, xsize)
+		if progress != None:
+			progress(i + nlines, ysize)
+	rasterProfile.stop('read', started, datarray.nbytes, datarray.size)
+	return datarray
+
+# function to get mask of invalid pixels in a strip of a band
+def _stripmask(values, NoDataVal, maskband, xoff, yoff, window=None):
+	'''Accepts Numpy 2D-array of a strip of a band, NoDataValue, mask band, pixel offsets of the strip and
+	(xsize, ysize) of the strip in the band if it was decimated, returns boolean array (True for invalid pixels),
+	or None if all pixels of the strip are valid.'''
+	bufysize, bufxsize = values.shape
+	xsize, ysize = bufxsize, bufysize
+	if window != None:
+		xsize, ysize = window
+	mask = None
+	if maskband != None:
+		# GDAL mask bands are 0 for invalid pixels, 255 (or alpha > 0) for valid pixels
+		valid = maskband.ReadRaster( xoff, yoff, xsize, ysize, bufxsize, bufysize, GDT_Byte)
+		mask = np.frombuffer(valid, dtype=np.uint8).reshape(bufysize, bufxsize) == 0
+	elif NoDataVal == NoDataVal and fitnodata(values.dtype, NoDataVal) == NoDataVal:
+		# exact match, NoDataValues which the datatype can not hold match no pixels
+		mask = values == values.dtype.type(NoDataVal)
+	if values.dtype.kind == 'f':
+		# NaN and infinite values, integers have none
+		invalid = np.isfinite(values)
+		np.logical_not(invalid, invalid)
+		if mask is None:
+			mask = invalid
+		else:
+			np.logical_or(mask, invalid, mask)
+	if mask is None or not mask.any():
+		return None
+	return mask
+
+# function to mask invalid pixels of a window of a band
+def _maskarray(band, datarray, xoff=0, yoff=0, window=None):
+	'''Accepts GDAL raster band, Numpy 2D-array of a window of the band, pixel offsets of the window and
+	(xsize, ysize) of the window in the band if the array was decimated (see _readarray), returns Numpy masked
+	array of the window (without copying it).
+
+	Pixels are masked using the band's GDAL mask band if it has one, otherwise using exact equality with the
+	NoDataValue, and NaN values of floating point bands are masked. The mask is made strip by strip and
+	is nomask if all pixels are valid.'''
+	started = rasterProfile.start()
+	NoDataVal, maskband = _maskinfo(band)
+	ysize, xsize = datarray.shape
+	mask = ma.nomask
+	if window != None and window != (xsize, ysize):
+		# decimated array, mask it in one piece
+		stripmask = _stripmask(datarray, NoDataVal, maskband, xoff, yoff, window)
+		if stripmask is not None:
+			mask = stripmask
+	else:
+		nrows = _striprows(band, xsize, datarray.dtype.itemsize)
+		for i in range(0, ysize, nrows):
+			stripmask = _stripmask(datarray[i:i+nrows], NoDataVal, maskband, xoff, yoff+i)
+			if stripmask is not None:
+				if mask is ma.nomask:
+					mask = np.zeros(datarray.shape, bool)
+				mask[i:i+nrows] = stripmask
+	fill_value = None
+	if NoDataVal != None:
+		fill_value = fitnodata(datarray.dtype, NoDataVal)
+	rasterProfile.stop('mask', started, 0, datarray.size)
+	return ma.array(datarray, mask=mask, fill_value=fill_value, copy=False)
+
 # function to read a band from a dataset
-def readrasterband(dataset, aband):
-	'''Accepts GDAL raster dataset and band number, returns Numpy 2D-array.'''
+def readrasterband(dataset, aband, dtype=None, progress=None, outsize=None):
+	'''Accepts GDAL raster dataset, band number, optional Numpy datatype, progress function and output size, returns Numpy 2D-array.
+
+	The band is read in its native datatype (e.g. uint8 for Byte bands) unless dtype is given.
+	progress is called with the number of rows read and total rows after each strip, and may raise an exception
+	to stop reading. If outsize (xsize, ysize) is given the band is decimated to that size (nearest neighbour),
+	reading from overviews where the file has them, e.g. for quick previews (see previewsize).
+
+	>>> band_1 = rasterIO.readrasterband(rasterpointer, 1, np.float32)
+	>>> preview_1 = rasterIO.readrasterband(rasterpointer, 1, outsize=rasterIO.previewsize(XSize, YSize))'''
 	if dataset.RasterCount >= aband:		
 		# Get one band
 		band = dataset.GetRasterBand(aband)
-		if band.GetNoDataValue() != None:
-			NoDataVal = band.GetNoDataValue()
-		else:
-			NoDataVal = 0
-			band.SetNoDataValue(NoDataVal)
-			#print "Warning NoDataValue not found, assuming 0!".format(dataset,aband)
-		# create blank array (full of 0's) to hold extracted data [note Y,X format]
-		dt = np.dtype(np.float32)
-		datarray = np.zeros( ( band.YSize,band.XSize ), dtype=dt )
-			# create loop based on YAxis (i.e. num rows)
-		for i in range(band.YSize):
-			# read lines of band	
-			scanline = band.ReadRaster( 0, i, band.XSize, 1, band.XSize, 1, GDT_Float32)
-			# unpack from binary representation
-			tuple_of_floats = struct.unpack('f' * band.XSize, scanline)
-			# add tuple to image array line by line
-			datarray[i,:] = tuple_of_floats	
-		# apply mask for NoDataVal
-		dataraster = ma.masked_values(datarray, NoDataVal)
-		# apply mask for NaN values
-		datarasterNaN = ma.masked_invalid(dataraster)
-		# return array (raster)
-		return datarasterNaN
+		datarray = _readarray(band, 0, 0, band.XSize, band.YSize, dtype, progress, outsize)
+		# return masked array (raster)
+		return _maskarray(band, datarray, 0, 0, (band.XSize, band.YSize))
 	else:
 		raise TypeError	
 
-# create function to write GeoTiff raster from NumPy n-dimensional array
-def writerasterband(myraster, outfile, format, aXSize, aYSize, geotrans, epsg):
-	''' Accepts raster in Numpy 2D-array, outputfile string, format and geotranslation metadata and writes to file on disk'''
+# largest dimension of previews in pixels
+PREVIEW_SIZE = 1024
+
+# function to get the size of a preview of a raster
+def previewsize(XSize, YSize, size=PREVIEW_SIZE):
+	'''Accepts raster size and largest preview dimension, returns (xsize, ysize) of preview keeping the aspect ratio.
+	Rasters smaller than size are not enlarged.'''
+	scale = min(1.0, float(size) / max(XSize, YSize))
+	return max(1, int(round(XSize * scale))), max(1, int(round(YSize * scale)))
+
+# function to get the geotransform of a decimated raster
+def previewgeotrans(geotrans, XSize, YSize, xsize, ysize):
+	'''Accepts geotransform and size of a raster and size of its preview, returns geotransform of the preview.'''
+	xscale = float(XSize) / xsize
+	yscale = float(YSize) / ysize
+	return (geotrans[0], geotrans[1] * xscale, geotrans[2] * yscale, geotrans[3], geotrans[4] * xscale, geotrans[5] * yscale)
+
+# function to read a window (sub-region) of a band from a dataset
+def readwindow(dataset, aband, xoff, yoff, xsize, ysize, dtype=None):
+	'''Accepts GDAL raster dataset, band number, window (pixel offsets and size) and optional Numpy datatype, returns Numpy 2D-array.'''
+	if dataset.RasterCount >= aband:
+		band = dataset.GetRasterBand(aband)
+		if xoff < 0 or yoff < 0 or xsize < 1 or ysize < 1 or xoff + xsize > band.XSize or yoff + ysize > band.YSize:
+			raise ValueError
+		datarray = _readarray(band, xoff, yoff, xsize, ysize, dtype)
+		return _maskarray(band, datarray, xoff, yoff)
+	else:
+		raise TypeError
+
+# function to read several bands from a dataset in one pass
+def readrasterbands(dataset, band_list, window=None, asdict=False, dtype=None):
+	'''Accepts GDAL raster dataset, list of band numbers, optional window (xoff, yoff, xsize, ysize) and Numpy datatype,
+	returns Numpy 3D-array [band, Y, X] of the bands, or a dict of Numpy 2D-arrays keyed by band number if asdict is True.
+
+	All bands are read together in each request, so pixel interleaved files are read from disk once.
+	Each band is masked using its own mask band or NoDataValue. By default bands are read in the smallest datatype
+	holding the native datatypes of all bands.
+
+	>>> band_1, band_2 = rasterIO.readrasterbands(rasterpointer, [1, 2])'''
+	band_list = list(band_list)
+	if len(band_list) < 1:
+		raise TypeError
+	for aband in band_list:
+		if aband < 1 or aband > dataset.RasterCount:
+			raise TypeError
+	if window == None:
+		xoff, yoff, xsize, ysize = 0, 0, dataset.RasterXSize, dataset.RasterYSize
+	else:
+		xoff, yoff, xsize, ysize = window
+	if xoff < 0 or yoff < 0 or xsize < 1 or ysize < 1 or xoff + xsize > dataset.RasterXSize or yoff + ysize > dataset.RasterYSize:
+		raise ValueError
+	nbands = len(band_list)
+	if dtype == None:
+		dtypes = [_readtype(dataset.GetRasterBand(aband))[0] for aband in band_list]
+		dtype = np.result_type(*dtypes)
+		if np.dtype(GDAL_NUMPY_TYPES[gdaltype(dtype)]) != dtype:
+			# e.g. UInt32 and Int32 bands
+			dtype = np.float64
+	dt, gdal_dtype = _readtype(dataset.GetRasterBand(band_list[0]), dtype)
+	started = rasterProfile.start()
+	datarray = np.empty( ( nbands,ysize,xsize ), dtype=dt )
+	# read strips of all bands, sized for the whole group of bands
+	nrows = _striprows(dataset.GetRasterBand(band_list[0]), xsize, dt.itemsize * nbands)
+	for i in range(0, ysize, nrows):
+		nlines = min(nrows, ysize - i)
+		strip = dataset.ReadRaster( xoff, yoff+i, xsize, nlines, xsize, nlines, gdal_dtype, band_list)
+		datarray[:,i:i+nlines,:] = np.frombuffer(strip, dtype=dt).reshape(nbands, nlines, xsize)
+	rasterProfile.stop('read', started, datarray.nbytes, datarray.size)
+	rasters = []
+	for j in range(nbands):
+		rasters.append(_maskarray(dataset.GetRasterBand(band_list[j]), datarray[j], xoff, yoff))
+	if asdict == True:
+		return dict(zip(band_list, rasters))
+	mask = ma.nomask
+	for j in range(nbands):
+		if ma.getmask(rasters[j]) is not ma.nomask:
+			if mask is ma.nomask:
+				mask = np.zeros(datarray.shape, bool)
+			mask[j] = ma.getmask(rasters[j])
+	return ma.array(datarray, mask=mask, copy=False)
+
+# function to get layout on disk of an uncompressed, striped GeoTiff band
+def _tifflayout(dataset, band, aband):
+	'''Accepts GDAL raster dataset, band and band number, returns (file name, byte offset, dtype, strides) of band
+	pixels if they can be memory mapped, otherwise None.'''
+	if dataset.GetMetadataItem('COMPRESSION', 'IMAGE_STRUCTURE') != None:
+		return None
+	if band.GetMetadataItem('NBITS', 'IMAGE_STRUCTURE') != None or band.DataType not in GDAL_NUMPY_TYPES:
+		return None
+	blockcols, blockrows = band.GetBlockSize()
+	if blockcols != band.XSize:
+		# tiled
+		return None
+	nstrips = (band.YSize + blockrows - 1) // blockrows
+	first = band.GetMetadataItem('BLOCK_OFFSET_0_0', 'TIFF')
+	last = band.GetMetadataItem('BLOCK_OFFSET_0_%i' % (nstrips - 1), 'TIFF')
+	if first == None or last == None:
+		return None
+	dt = np.dtype(GDAL_NUMPY_TYPES[band.DataType])
+	# pixel interleaved bands share strips, band interleaved bands have their own strips
+	if dataset.RasterCount > 1 and dataset.GetMetadataItem('INTERLEAVE', 'IMAGE_STRUCTURE') == 'PIXEL':
+		pixelstride = dt.itemsize * dataset.RasterCount
+		offset = int(first) + (aband - 1) * dt.itemsize
+	else:
+		pixelstride = dt.itemsize
+		offset = int(first)
+	linestride = pixelstride * band.XSize
+	# strips must be stored one after the other
+	if int(last) - int(first) != (nstrips - 1) * blockrows * linestride:
+		return None
+	fname = dataset.GetFileList()[0]
+	try:
+		infile = open(fname, 'rb')
+	except EnvironmentError:
+		# not a file on disk, e.g. a GDAL virtual file (/vsizip/, /vsimem/)
+		return None
+	try:
+		byteorder = infile.read(2)
+	finally:
+		infile.close()
+	if byteorder == 'MM':
+		dt = dt.newbyteorder('>')
+	else:
+		dt = dt.newbyteorder('<')
+	return fname, offset, dt, (linestride, pixelstride)
+
+# function to memory map a band from a dataset
+def mmaprasterband(dataset, aband, masked=True):
+	'''Accepts GDAL raster dataset, band number and masked flag, returns Numpy 2D-array of the band in its native datatype,
+	backed by the file on disk (np.memmap) rather than read into memory.
+
+	Uncompressed, striped GeoTiff bands are mapped using their offsets in the file. Bands of other formats are
+	mapped using GDAL virtual memory where the driver maps the file directly (e.g. ENVI, EHdr and other raw formats),
+	not GDAL's default page-fault implementation, which reads blocks on access.
+	Compressed and tiled bands, bands of GDAL virtual files (e.g. /vsizip/, /vsimem/) and systems without virtual
+	memory support fall back to readrasterband.
+	If masked is True the NoData and NaN pixels are masked, which reads the band once; use masked=False to
+	open the band without reading it.'''
+	if dataset.RasterCount >= aband:
+		band = dataset.GetRasterBand(aband)
+		datarray = None
+		if dataset.GetDriver().ShortName == 'GTiff':
+			layout = _tifflayout(dataset, band, aband)
+			if layout != None:
+				fname, offset, dt, strides = layout
+				try:
+					mapped = np.memmap(fname, dtype=np.uint8, mode='r')
+					datarray = np.ndarray((band.YSize, band.XSize), dtype=dt, buffer=mapped, offset=offset, strides=strides)
+				except EnvironmentError:
+					datarray = None
+		else:
+			try:
+				# without the default implementation GDAL only maps bands stored raw on disk
+				datarray = band.GetVirtualMemAutoArray(GF_Read, ['USE_DEFAULT_IMPLEMENTATION=NO'])
+			except (AttributeError, RuntimeError, NotImplementedError, TypeError):
+				datarray = None
+		if datarray is None:
+			datarray = readrasterband(dataset, aband)
+			if masked == False:
+				return ma.getdata(datarray)
+			return datarray
+		if masked == False:
+			return datarray
+		return _maskarray(band, datarray)
+	else:
+		raise TypeError
+
+# function to generate the windows covering a band
+def blockwindows(dataset, aband, tilesize=None, overlap=0):
+	'''Accepts GDAL raster dataset, band number, optional tile size (int or (xsize, ysize)) and overlap in pixels,
+	returns generator of windows (xoff, yoff, xsize, ysize).
+
+	Default tiles are aligned to the band's native block size. Windows are extended by overlap pixels
+	on each side, clipped to the band extent.'''
+	if dataset.RasterCount >= aband:
+		band = dataset.GetRasterBand(aband)
+		XSize = band.XSize
+		YSize = band.YSize
+		if tilesize == None:
+			tilex, tiley = _tilesize(band, _readtype(band)[0].itemsize)
+		elif isinstance(tilesize, (int, long)):
+			tilex, tiley = tilesize, tilesize
+		else:
+			tilex, tiley = tilesize
+		if tilex < 1 or tiley < 1 or overlap < 0:
+			raise ValueError
+		for y in range(0, YSize, tiley):
+			for x in range(0, XSize, tilex):
+				xoff = max(x - overlap, 0)
+				yoff = max(y - overlap, 0)
+				xend = min(x + tilex + overlap, XSize)
+				yend = min(y + tiley + overlap, YSize)
+				yield xoff, yoff, xend - xoff, yend - yoff
+	else:
+		raise TypeError
+
+# function to iterate over a band tile by tile
+def iterblocks(dataset, aband, tilesize=None, overlap=0, dtype=None):
+	'''Accepts GDAL raster dataset, band number, optional tile size (int or (xsize, ysize)), overlap in pixels and Numpy datatype,
+	returns generator of (window, tile) pairs, where window is (xoff, yoff, xsize, ysize) and tile is a Numpy masked array.
+
+	Only one tile is held in memory at a time, allowing processing of rasters larger than memory.
+
+	>>> for window, tile in rasterIO.iterblocks(rasterpointer, 1, 512):
+	...	total += tile.sum()'''
+	if dataset.RasterCount >= aband:
+		band = dataset.GetRasterBand(aband)
+		for window in blockwindows(dataset, aband, tilesize, overlap):
+			xoff, yoff, xsize, ysize = window
+			yield window, _maskarray(band, _readarray(band, xoff, yoff, xsize, ysize, dtype), xoff, yoff)
+	else:
+		raise TypeError
+
+# default number of windows read ahead by Prefetcher
+PREFETCH_DEPTH = 4
+# default memory limit of windows read ahead by Prefetcher, in bytes
+PREFETCH_BYTES = 268435456
+#
+# class to read windows of bands ahead in a background thread
+class Prefetcher:
+	'''Reads windows of one or more bands in a background thread, ahead of the windows being processed.
+
+	sources is a list of (file name, band number) pairs and windows a list of (xoff, yoff, xsize, ysize),
+	by default the tiles of the first band (see blockwindows). Iterating returns (window, tiles) pairs in
+	window order, where tiles is a list of Numpy masked arrays, one per source. At most depth windows,
+	using at most maxbytes of memory, are read ahead (at least one window is always read ahead).
+	Reads overlap with processing of the previous window, hiding the latency of slow (e.g. network) storage.
+	The background thread opens its own datasets.
+
+	>>> for window, (band_1, band_2) in rasterIO.Prefetcher([(fname, 1), (fname, 2)]):
+	...	ndvi = (band_2 - band_1) / (band_2 + band_1)'''
+
+	def __init__(self, sources, windows=None, depth=PREFETCH_DEPTH, maxbytes=PREFETCH_BYTES, dtype=None):
+		self.sources = list(sources)
+		if len(self.sources) < 1 or depth < 1:
+			raise ValueError
+		itemsizes = []
+		for fname, aband in self.sources:
+			dataset = openpooledraster(fname)
+			if dataset.RasterCount < aband:
+				raise TypeError
+			# bytes of each pixel, data and mask
+			itemsizes.append(_readtype(dataset.GetRasterBand(aband), dtype)[0].itemsize + 1)
+		if windows == None:
+			fname, aband = self.sources[0]
+			windows = blockwindows(openpooledraster(fname), aband)
+		self.windows = list(windows)
+		self.pixelbytes = sum(itemsizes)
+		self.depth = depth
+		self.maxbytes = maxbytes
+		self.dtype = dtype
+		# windows read ahead, and their size in bytes
+		self.queue = []
+		self.queuebytes = 0
+		self.error = None
+		self.closed = False
+		self.condition = threading.Condition()
+		self.thread = threading.Thread(target=self._read)
+		self.thread.setDaemon(True)
+		self.thread.start()
+
+	def _read(self):
+		# GDAL datasets can not be shared between threads, open datasets for this thread
+		datasets = {}
+		try:
+			for window in self.windows:
+				xoff, yoff, xsize, ysize = window
+				nbytes = xsize * ysize * self.pixelbytes
+				# wait for space in the queue
+				self.condition.acquire()
+				try:
+					while not self.closed and len(self.queue) > 0 and (len(self.queue) >= self.depth or self.queuebytes + nbytes > self.maxbytes):
+						self.condition.wait()
+					if self.closed:
+						return
+					self.queuebytes += nbytes
+				finally:
+					self.condition.release()
+				tiles = []
+				for fname, aband in self.sources:
+					if fname not in datasets:
+						datasets[fname] = opengdalraster(fname)
+					tiles.append(readwindow(datasets[fname], aband, xoff, yoff, xsize, ysize, self.dtype))
+				self._put((window, tiles, nbytes))
+			self._put(None)
+		except:
+			self.error = sys.exc_info()
+			self._put(None)
+
+	def _put(self, item):
+		self.condition.acquire()
+		try:
+			self.queue.append(item)
+			self.condition.notifyAll()
+		finally:
+			self.condition.release()
+
+	def __iter__(self):
+		try:
+			while True:
+				self.condition.acquire()
+				try:
+					while len(self.queue) < 1:
+						self.condition.wait()
+					item = self.queue.pop(0)
+					if item != None:
+						self.queuebytes -= item[2]
+					self.condition.notifyAll()
+				finally:
+					self.condition.release()
+				if item == None:
+					if self.error != None:
+						raise self.error[0], self.error[1], self.error[2]
+					return
+				yield item[0], item[1]
+		finally:
+			self.close()
+
+	def close(self):
+		'''Stops reading ahead and waits for the background thread to finish.'''
+		self.condition.acquire()
+		try:
+			self.closed = True
+			self.condition.notifyAll()
+		finally:
+			self.condition.release()
+		if self.thread != threading.currentThread():
+			self.thread.join()
+
+# function to get a NoDataValue representable in a datatype
+def fitnodata(dtype, NoDataVal):
+	'''Accepts Numpy datatype and NoDataValue, returns NoDataValue representable in the datatype.
+
+	Values out of the range of integer datatypes are replaced by the datatype's maximum (unsigned types)
+	or minimum (signed types).'''
+	dt = np.dtype(dtype)
+	if dt.kind not in 'iu':
+		return NoDataVal
+	info = np.iinfo(dt)
+	if NoDataVal == NoDataVal and NoDataVal == int(NoDataVal) and info.min <= NoDataVal <= info.max:
+		return int(NoDataVal)
+	if info.min == 0:
+		return int(info.max)
+	return int(info.min)
+
+# function to test whether a value is a valid pixel of an array
+def _hasvalue(myraster, value):
+	'''Accepts raster in Numpy 2D-array and value, returns True if any valid (unmasked) pixel equals the value.'''
+	rows = max(1, READ_CHUNK_BYTES // max(1, myraster[0].size * myraster.dtype.itemsize))
+	for i in range(0, myraster.shape[0], rows):
+		strip = myraster[i:i+rows]
+		found = ma.getdata(strip) == value
+		if ma.getmask(strip) is not ma.nomask:
+			found &= ~ma.getmask(strip)
+		if found.any():
+			return True
+	return False
+
+# integer datatypes in order of size, used to find the smallest datatype of an array
+SMALLEST_TYPES = (GDT_Byte, GDT_UInt16, GDT_Int16, GDT_UInt32, GDT_Int32)
+#
+# function to get the smallest GDAL datatype able to hold an array
+def smallesttype(myraster, NoDataVal=9999, types=SMALLEST_TYPES):
+	'''Accepts raster in Numpy 2D-array, NoDataValue and optional list of integer GDAL datatypes,
+	returns smallest GDAL datatype holding the valid pixels and a NoDataValue, and the NoDataValue.
+
+	Integer datatypes are used if all valid pixels are whole numbers. NoDataVal is used if the datatype can hold it and
+	no valid pixel has that value, otherwise the datatype's maximum (or minimum) if no valid pixel has that value.
+	Boolean arrays are stored as Byte. Other arrays are stored as Float32,
+	or Float64 for Float64 arrays and integers Float32 can not hold exactly.'''
+	vmin = None
+	vmax = None
+	whole = True
+	# scan valid pixels strip by strip, avoiding a full size temporary array
+	rows = max(1, READ_CHUNK_BYTES // max(1, myraster[0].size * myraster.dtype.itemsize))
+	for i in range(0, myraster.shape[0], rows):
+		values = ma.compressed(myraster[i:i+rows])
+		if values.size < 1:
+			continue
+		if values.dtype.kind == 'b':
+			values = values.astype(np.uint8)
+		elif values.dtype.kind not in 'iu' and whole:
+			whole = bool(np.all(np.isfinite(values))) and bool(np.all(np.floor(values) == values))
+		if vmin == None:
+			vmin, vmax = values.min(), values.max()
+		else:
+			vmin, vmax = min(vmin, values.min()), max(vmax, values.max())
+	if vmin == None:
+		vmin, vmax = 0, 0
+	if whole:
+		for gdal_dtype in types:
+			info = np.iinfo(GDAL_NUMPY_TYPES[gdal_dtype])
+			if vmin < info.min or vmax > info.max:
+				continue
+			if fitnodata(GDAL_NUMPY_TYPES[gdal_dtype], NoDataVal) == NoDataVal:
+				if NoDataVal < vmin or NoDataVal > vmax or not _hasvalue(myraster, NoDataVal):
+					return gdal_dtype, int(NoDataVal)
+			if vmax < info.max:
+				return gdal_dtype, int(info.max)
+			if vmin > info.min:
+				return gdal_dtype, int(info.min)
+	if myraster.dtype == np.float64 or (whole and max(abs(vmin), abs(vmax)) > 2 ** 24):
+		return GDT_Float64, NoDataVal
+	return GDT_Float32, NoDataVal
+
+# function to get GDAL datatype and NoDataValue used to write an array
+def writeparams(myraster, dtype=None):
+	'''Accepts raster in Numpy 2D-array and optional output datatype, returns GDAL datatype and NoDataValue for writing it to file.
+
+	dtype is the name of a GDAL datatype (see GDAL_TYPE_NAMES), 'Smallest' for the smallest datatype holding the
+	raster (see smallesttype) or None to keep the datatype of the array. The NoDataValue is the fill value of masked
+	arrays (otherwise 9999), replaced by a value representable in the datatype where needed. Boolean arrays are
+	written as Byte with NoDataValue 255. Integer arrays with a valid pixel equal to the NoDataValue are written
+	in a larger datatype with NoDataValue 9999 (see smallesttype), so no valid pixel is written as NoData.'''
 	# get noDataValue from matrix mask value
 	# print myraster.fill_value
-	if type(myraster) == np.ma.core.MaskedArray:
+	if myraster.dtype.kind == 'b':
+		# the fill value of booleans is True, a valid pixel
+		NoDataVal = 255
+	elif type(myraster) == np.ma.core.MaskedArray:
 		NoDataVal = myraster.fill_value
 	else:
 		NoDataVal = 9999
-	# get dtype of input array
-	if myraster.dtype == 'int16':
-		gdal_dtype = gdal.GDT_Int16
+	# get dtype of output raster
+	if dtype == 'Smallest':
+		return smallesttype(myraster, NoDataVal)
+	elif dtype != None:
+		if dtype not in GDAL_TYPE_NAMES:
+			raise ValueError
+		gdal_dtype = GDAL_TYPE_NAMES[dtype]
 	else:
-		gdal_dtype = gdal.GDT_Float32
-	# get driver and driver properties	
-	driver = gdal.GetDriverByName( format )
-	metadata  = driver.GetMetadata()
-	# check that specified driver has gdal create method and go create	
-	if metadata.has_key(gdal.DCAP_CREATE) and metadata[gdal.DCAP_CREATE] =='YES':
-		# Creare destination data-set
-		#dst_ds = driver.Create( outfile, aXSize, aYSize, 1, gdal.GDT_Float32 )
-		dst_ds = driver.Create( outfile, aXSize, aYSize, 1, gdal_dtype )
-		# define "srs" as a home for coordinate system parameters
-		srs = osr.SpatialReference()
-		# import the standard OSGB36/BNG EPSG ProjCRS
-		srs.ImportFromEPSG( epsg )
-		# apply the geotransformation taken frok previosu image (Dundee = OSTN02 London localised?)
-		dst_ds.SetGeoTransform( geotrans )
-		# export these features to embedded well Known Text in the GeoTiff
-		dst_ds.SetProjection( srs.ExportToWkt() )
-		# write the raster band to file
-		dst_ds.GetRasterBand(1).SetNoDataValue(NoDataVal)
-		dst_ds.GetRasterBand(1).WriteArray ( myraster )
-		dst_ds = None
-	# catch error if no write method for format specified
+		gdal_dtype = gdaltype(myraster.dtype)
+		numpy_dtype = GDAL_NUMPY_TYPES[gdal_dtype]
+		# NoDataValue must not be a valid pixel value, use a larger datatype if needed
+		larger = [t for t in SMALLEST_TYPES if np.dtype(GDAL_NUMPY_TYPES[t]).itemsize >= np.dtype(numpy_dtype).itemsize]
+		if fitnodata(numpy_dtype, NoDataVal) != NoDataVal:
+			return smallesttype(myraster, NoDataVal, larger)
+		if np.dtype(numpy_dtype).kind in 'iu' and myraster.dtype.kind != 'b' and _hasvalue(myraster, NoDataVal):
+			return smallesttype(myraster, 9999, larger)
+	return gdal_dtype, fitnodata(GDAL_NUMPY_TYPES[gdal_dtype], NoDataVal)
+
+# compression methods for output rasters
+COMPRESSION = ('None', 'LZW', 'DEFLATE')
+# block size of tiled output rasters
+WRITE_BLOCK_SIZE = 256
+#
+# function to get GDAL creation options for an output raster
+def creationoptions(format, compress=None, gdal_dtype=GDT_Float32):
+	'''Accepts format, compression method (see COMPRESSION) and GDAL datatype, returns list of GDAL creation options.
+
+	GeoTiffs are tiled, compressed with a predictor suited to the datatype and use BigTIFF where needed.
+	Erdas Imagine files are compressed with HFA run length compression if any compression is chosen.'''
+	options = []
+	if compress == 'None':
+		compress = None
+	if format == 'GTiff':
+		options = ['TILED=YES', 'BLOCKXSIZE=%i' % WRITE_BLOCK_SIZE, 'BLOCKYSIZE=%i' % WRITE_BLOCK_SIZE, 'BIGTIFF=IF_SAFER']
+		if compress != None:
+			options.append('COMPRESS=%s' % compress)
+			if gdal_dtype in (GDT_Float32, GDT_Float64):
+				options.append('PREDICTOR=3')
+			else:
+				options.append('PREDICTOR=2')
+			options.append('NUM_THREADS=ALL_CPUS')
+	elif format == 'HFA':
+		options = ['BLOCKSIZE=%i' % WRITE_BLOCK_SIZE]
+		if compress != None:
+			options.append('COMPRESSED=YES')
+	return options
+
+# function to convert an array to the datatype of an output raster
+def _convert(datarray, dtype):
+	'''Accepts Numpy array and datatype, returns copy of array in the datatype.
+
+	As GDAL does, values are rounded to the nearest integer and clipped to the range of integer datatypes.'''
+	dt = np.dtype(dtype)
+	if dt.kind in 'iu' and datarray.dtype.kind not in 'bu' and not np.can_cast(datarray.dtype, dt):
+		info = np.iinfo(dt)
+		if datarray.dtype.kind == 'f':
+			datarray = np.rint(datarray)
+		datarray = np.clip(datarray, info.min, info.max)
+	elif dt.kind in 'iu' and datarray.dtype.kind == 'u' and not np.can_cast(datarray.dtype, dt):
+		datarray = np.minimum(datarray, np.iinfo(dt).max)
+	return datarray.astype(dt)
+
+# class to write a new raster to disk, tile by tile
+class RasterWriter:
+	'''Creates a new raster on disk and writes it tile by tile (or band by band).
+
+	The coordinate system epsg may be an EPSG code, well known text or osr.SpatialReference (see projectionwkt).
+	Masked pixels are written as NoDataVal, replaced by a value representable in gdal_dtype where needed
+	(see fitnodata). Arrays are converted to gdal_dtype when written. Creation options (e.g. TILED, BLOCKXSIZE, COMPRESS, PREDICTOR,
+	NUM_THREADS, BIGTIFF) default to creationoptions(format, compress, gdal_dtype); options given in the
+	options list take precedence.
+
+	>>> writer = rasterIO.RasterWriter(outfile, 'GTiff', XSize, YSize, geotrans, epsg, compress='DEFLATE')
+	>>> for window, tile in rasterIO.iterblocks(rasterpointer, 1):
+	...	writer.write(tile * 2, window[0], window[1])
+	>>> writer.close()'''
+
+	def __init__(self, outfile, format, aXSize, aYSize, geotrans, epsg, nbands=1, gdal_dtype=GDT_Float32, NoDataVal=9999, compress=None, options=None):
+		self.outfile = outfile
+		self.format = format
+		self.NoDataVal = NoDataVal
+		if gdal_dtype in GDAL_NUMPY_TYPES:
+			self.NoDataVal = fitnodata(GDAL_NUMPY_TYPES[gdal_dtype], NoDataVal)
+		# merge creation options, options given by the caller first
+		createoptions = []
+		if options != None:
+			createoptions = list(options)
+		keys = [option.split('=')[0].upper() for option in createoptions]
+		for option in creationoptions(format, compress, gdal_dtype):
+			if option.split('=')[0] not in keys:
+				createoptions.append(option)
+		# get driver and driver properties	
+		self.driver = gdal.GetDriverByName( format )
+		metadata  = self.driver.GetMetadata()
+		# check that specified driver has gdal create method and go create	
+		if metadata.has_key(gdal.DCAP_CREATE) and metadata[gdal.DCAP_CREATE] =='YES':
+			# Creare destination data-set
+			self.dataset = self.driver.Create( outfile, aXSize, aYSize, nbands, gdal_dtype, createoptions )
+			# apply the geotransformation taken frok previosu image (Dundee = OSTN02 London localised?)
+			self.dataset.SetGeoTransform( geotrans )
+			# embed well Known Text of the coordinate system (EPSG code, WKT or SpatialReference) in the GeoTiff
+			self.dataset.SetProjection( projectionwkt(epsg) )
+			for aband in range(1, nbands + 1):
+				self.dataset.GetRasterBand(aband).SetNoDataValue(self.NoDataVal)
+		# catch error if no write method for format specified
+		else:
+			#print 'Error, GDAL %s driver does not support Create() method.' % outformat
+			raise TypeError
+
+	def write(self, myraster, xoff=0, yoff=0, aband=1):
+		'''Accepts raster (tile) in Numpy 2D-array, pixel offsets of tile and band number, writes tile to file.'''
+		started = rasterProfile.start()
+		band = self.dataset.GetRasterBand(aband)
+		mask = ma.getmask(myraster)
+		datarray = ma.getdata(myraster)
+		if band.DataType in GDAL_NUMPY_TYPES and datarray.dtype != GDAL_NUMPY_TYPES[band.DataType]:
+			datarray = _convert(datarray, GDAL_NUMPY_TYPES[band.DataType])
+		elif mask is not ma.nomask:
+			datarray = datarray.copy()
+		if mask is not ma.nomask:
+			np.putmask(datarray, mask, self.NoDataVal)
+		band.WriteArray ( datarray, xoff, yoff )
+		rasterProfile.stop('write', started, datarray.nbytes, datarray.size)
+
+	def writeband(self, myraster, aband=1, progress=None):
+		'''Accepts raster in Numpy 2D-array, band number and optional progress function (called with rows written and
+		total rows after each strip), writes whole band to file in strips of whole blocks.'''
+		band = self.dataset.GetRasterBand(aband)
+		nrows = _striprows(band, band.XSize, myraster.dtype.itemsize)
+		for i in range(0, myraster.shape[0], nrows):
+			self.write(myraster[i:i+nrows], 0, i, aband)
+			if progress != None:
+				progress(min(i + nrows, myraster.shape[0]), myraster.shape[0])
+
+	def close(self):
+		'''Flushes and closes the file.'''
+		if self.dataset != None:
+			started = rasterProfile.start()
+			self.dataset.FlushCache()
+			self.dataset = None
+			rasterProfile.stop('write', started)
+
+	def abort(self):
+		'''Closes and deletes the (partially written) file.'''
+		self.dataset = None
+		try:
+			self.driver.Delete(self.outfile)
+		except RuntimeError:
+			pass
+		if os.path.isfile(self.outfile):
+			os.remove(self.outfile)
+
+# create function to write GeoTiff raster from NumPy n-dimensional array
+def writerasterband(myraster, outfile, format, aXSize, aYSize, geotrans, epsg, compress=None, options=None, dtype=None, progress=None):
+	''' Accepts raster in Numpy 2D-array, outputfile string, format and geotranslation metadata and writes to file on disk
+	in datatype dtype (see writeparams). epsg may be an EPSG code, or the well known text of the source raster (see projectionwkt). progress is called with rows written and total rows (see RasterWriter.writeband),
+	if writing fails or progress raises an exception the partially written file is removed.'''
+	gdal_dtype, NoDataVal = writeparams(myraster, dtype)
+	writer = RasterWriter(outfile, format, aXSize, aYSize, geotrans, epsg, 1, gdal_dtype, NoDataVal, compress, options)
+	# write the raster band to file
+	try:
+		writer.writeband(myraster, 1, progress)
+	except:
+		writer.abort()
+		raise
+	writer.close()
+
+# resampling methods of overviews
+RESAMPLING = ('AVERAGE', 'NEAREST', 'MODE', 'GAUSS', 'CUBIC')
+# overviews are added until the smallest overview fits in this many pixels across
+OVERVIEW_MIN_SIZE = 256
+
+# function to get default overview levels of a raster
+def overviewlevels(aXSize, aYSize, minsize=OVERVIEW_MIN_SIZE):
+	'''Accepts raster size and size of smallest overview, returns list of overview decimation factors (2, 4, 8 ...).'''
+	levels = []
+	factor = 2
+	while max(aXSize, aYSize) // (factor // 2) > minsize:
+		levels.append(factor)
+		factor *= 2
+	return levels
+
+# function to add overviews (pyramids) to a raster on disk
+def buildoverviews(fname, levels=None, resampling='AVERAGE', external=False, compress=None, progress=None):
+	'''Accepts gdal compatible file on disk, list of decimation factors (default overviewlevels), resampling method
+	(see RESAMPLING), flag to write overviews to an external .ovr file rather than into the file, compression of
+	overviews and progress function (called with percentage done and 100, and may raise an exception to stop),
+	builds overviews of all bands.
+
+	GDAL builds overviews block by block. External overviews leave the file unchanged.
+
+	>>> rasterIO.writerasterband(newband, outfile, 'GTiff', XSize, YSize, geotrans, epsg)
+	>>> rasterIO.buildoverviews(outfile, resampling='NEAREST', external=True)'''
+	resampling = str(resampling).upper()
+	if resampling not in RESAMPLING:
+		raise ValueError
+	if external:
+		dataset = gdal.Open(fname, GA_ReadOnly)
 	else:
-		#print 'Error, GDAL %s driver does not support Create() method.' % outformat
-		raise TypeError
+		dataset = gdal.Open(fname, GA_Update)
+	if dataset == None:
+		raise IOError
+	if levels == None:
+		levels = overviewlevels(dataset.RasterXSize, dataset.RasterYSize)
+	if len(levels) < 1:
+		return
+	errors = []
+	def callback(complete, message, data):
+		if progress != None:
+			try:
+				progress(int(complete * 100), 100)
+			except:
+				# stop GDAL, the exception is raised when BuildOverviews returns
+				errors.append(sys.exc_info())
+				return 0
+		return 1
+	option = None
+	if compress != None and compress != 'None':
+		option = gdal.GetConfigOption('COMPRESS_OVERVIEW', None)
+		gdal.SetConfigOption('COMPRESS_OVERVIEW', compress)
+	started = rasterProfile.start()
+	try:
+		result = dataset.BuildOverviews(resampling, list(levels), callback)
+		rasterProfile.stop('overviews', started)
+	finally:
+		if compress != None and compress != 'None':
+			gdal.SetConfigOption('COMPRESS_OVERVIEW', option)
+		dataset = None
+		# pooled datasets of the file do not know about the new overviews
+		invalidateraster(fname)
+	if len(errors) > 0:
+		raise errors[0][0], errors[0][1], errors[0][2]
+	if result != 0:
+		raise IOError
+#
+# memoized results of wkt2epsg and epsg2wkt
+_wkt2epsgcache = {}
+_epsg2wktcache = {}
 #
 # function to get Authority (e.g. EPSG) code from well known text
 def wkt2epsg(wkt):
 	'''
 	Accepts well known text of Projection/Coordinate Reference System and generates
-	EPSG code'''
-	srs = osr.SpatialReference(wkt)
-	if (srs.IsProjected()):
-		try:
-			return int(srs.GetAuthorityCode("PROJCS"))
-		except TypeError:
-			sys.stderr.write("Message from rasterIO.wkt2epsg:\t Projected EPSG code not found, wkt2epg will return EPSG of 0.\n")			
-			return int(0)
+	EPSG code. Results are memoized.'''
+	if wkt not in _wkt2epsgcache:
+		srs = osr.SpatialReference(wkt)
+		if (srs.IsProjected()):
+			try:
+				epsg = int(srs.GetAuthorityCode("PROJCS"))
+			except TypeError:
+				sys.stderr.write("Message from rasterIO.wkt2epsg:\t Projected EPSG code not found, wkt2epg will return EPSG of 0.\n")			
+				epsg = int(0)
 		else:
-			return int(0)	
-	else:
-		return int(srs.GetAuthorityCode("GEOGCS"))
+			epsg = int(srs.GetAuthorityCode("GEOGCS"))
+		_wkt2epsgcache[wkt] = epsg
+	return _wkt2epsgcache[wkt]
+
+# function to get well known text from EPSG code
+def epsg2wkt(epsg):
+	'''Accepts EPSG code, returns well known text of the Coordinate Reference System ('' if the code is unknown).
+	Results are memoized.'''
+	if epsg not in _epsg2wktcache:
+		srs = osr.SpatialReference()
+		wkt = ''
+		if srs.ImportFromEPSG(int(epsg)) == 0:
+			wkt = srs.ExportToWkt()
+		_epsg2wktcache[epsg] = wkt
+	return _epsg2wktcache[epsg]
 
+# function to get well known text of a coordinate system given in any form
+def projectionwkt(crs):
+	'''Accepts EPSG code (e.g. 27700 or 'EPSG:27700'), well known text or osr.SpatialReference, returns well known text.
 
-	 
+	Well known text is returned unchanged, so projections without an EPSG code (which wkt2epsg returns as 0)
+	are kept, and no EPSG lookup is needed when writing with the projection of a source raster.'''
+	if crs == None:
+		return ''
+	if isinstance(crs, osr.SpatialReference):
+		return crs.ExportToWkt()
+	if isinstance(crs, basestring):
+		code = crs.strip()
+		if code.upper().startswith('EPSG:'):
+			code = code[5:]
+		if not code.isdigit():
+			return crs
+		crs = int(code)
+	if crs == 0:
+		return ''
+	return epsg2wkt(crs)
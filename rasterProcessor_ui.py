@@ -68,7 +68,7 @@ class Ui_Form(object):
         self.btn3.setGeometry(QtCore.QRect(630, 290, 61, 31))
         self.btn3.setObjectName("btn3")
         self.comboFormats = QtGui.QComboBox(self.tab)
-        self.comboFormats.setGeometry(QtCore.QRect(10, 290, 491, 28))
+        self.comboFormats.setGeometry(QtCore.QRect(10, 290, 161, 28))
         self.comboFormats.setObjectName("comboFormats")
         self.comboFormats.addItem("")
         self.comboFormats.addItem("")
@@ -110,6 +110,9 @@ class Ui_Form(object):
         self.btnLoad = QtGui.QPushButton(self.tab)
         self.btnLoad.setGeometry(QtCore.QRect(390, 61, 111, 30))
         self.btnLoad.setObjectName("btnLoad")
+        self.labelCache = QtGui.QLabel(self.tab)
+        self.labelCache.setGeometry(QtCore.QRect(390, 100, 111, 61))
+        self.labelCache.setObjectName("labelCache")
         self.btn0 = QtGui.QPushButton(self.tab)
         self.btn0.setGeometry(QtCore.QRect(510, 320, 61, 31))
         self.btn0.setObjectName("btn0")
@@ -141,9 +144,69 @@ class Ui_Form(object):
         self.checkBoxQGIS.setChecked(True)
         self.checkBoxQGIS.setTristate(False)
         self.checkBoxQGIS.setObjectName("checkBoxQGIS")
+        self.checkBoxStream = QtGui.QCheckBox(self.tab)
+        self.checkBoxStream.setGeometry(QtCore.QRect(220, 330, 281, 23))
+        self.checkBoxStream.setChecked(True)
+        self.checkBoxStream.setObjectName("checkBoxStream")
         self.labeloutformat = QtGui.QLabel(self.tab)
         self.labeloutformat.setGeometry(QtCore.QRect(10, 270, 91, 18))
         self.labeloutformat.setObjectName("labeloutformat")
+        self.labelCompression = QtGui.QLabel(self.tab)
+        self.labelCompression.setGeometry(QtCore.QRect(180, 270, 121, 18))
+        self.labelCompression.setObjectName("labelCompression")
+        self.comboCompression = QtGui.QComboBox(self.tab)
+        self.comboCompression.setGeometry(QtCore.QRect(180, 290, 151, 28))
+        self.comboCompression.setObjectName("comboCompression")
+        self.comboCompression.addItem("")
+        self.comboCompression.addItem("")
+        self.comboCompression.addItem("")
+        self.labelDtype = QtGui.QLabel(self.tab)
+        self.labelDtype.setGeometry(QtCore.QRect(340, 270, 121, 18))
+        self.labelDtype.setObjectName("labelDtype")
+        self.comboDtype = QtGui.QComboBox(self.tab)
+        self.comboDtype.setGeometry(QtCore.QRect(340, 290, 161, 28))
+        self.comboDtype.setObjectName("comboDtype")
+        self.comboDtype.addItem("")
+        self.comboDtype.addItem("")
+        self.comboDtype.addItem("")
+        self.comboDtype.addItem("")
+        self.comboDtype.addItem("")
+        self.comboDtype.addItem("")
+        self.comboDtype.addItem("")
+        self.comboDtype.addItem("")
+        self.comboDtype.addItem("")
+        self.progressBar = QtGui.QProgressBar(self.tab)
+        self.progressBar.setGeometry(QtCore.QRect(510, 356, 371, 23))
+        self.progressBar.setProperty("value", 0)
+        self.progressBar.setObjectName("progressBar")
+        self.btnCancel = QtGui.QPushButton(self.tab)
+        self.btnCancel.setEnabled(False)
+        self.btnCancel.setGeometry(QtCore.QRect(890, 354, 101, 27))
+        self.btnCancel.setObjectName("btnCancel")
+        self.btnPreview = QtGui.QPushButton(self.tab)
+        self.btnPreview.setGeometry(QtCore.QRect(890, 260, 101, 31))
+        self.btnPreview.setObjectName("btnPreview")
+        self.labelOverviews = QtGui.QLabel(self.tab)
+        self.labelOverviews.setGeometry(QtCore.QRect(10, 358, 71, 18))
+        self.labelOverviews.setObjectName("labelOverviews")
+        self.comboOverviews = QtGui.QComboBox(self.tab)
+        self.comboOverviews.setGeometry(QtCore.QRect(90, 354, 161, 26))
+        self.comboOverviews.setObjectName("comboOverviews")
+        self.comboOverviews.addItem("")
+        self.comboOverviews.addItem("")
+        self.comboOverviews.addItem("")
+        self.comboResampling = QtGui.QComboBox(self.tab)
+        self.comboResampling.setGeometry(QtCore.QRect(260, 354, 121, 26))
+        self.comboResampling.setObjectName("comboResampling")
+        self.comboResampling.addItem("")
+        self.comboResampling.addItem("")
+        self.comboResampling.addItem("")
+        self.comboResampling.addItem("")
+        self.comboResampling.addItem("")
+        self.checkBoxProfile = QtGui.QCheckBox(self.tab)
+        self.checkBoxProfile.setGeometry(QtCore.QRect(390, 196, 111, 23))
+        self.checkBoxProfile.setChecked(False)
+        self.checkBoxProfile.setObjectName("checkBoxProfile")
         self.tabWidget.addTab(self.tab, "")
         self.tab_2 = QtGui.QWidget()
         self.tab_2.setObjectName("tab_2")
@@ -248,6 +311,8 @@ class Ui_Form(object):
         self.checkBoxGenerateOutput.setText(QtGui.QApplication.translate("Form", "Run without creating new file (output will be shown in log)", None, QtGui.QApplication.UnicodeUTF8))
         self.btnLoad.setToolTip(QtGui.QApplication.translate("Form", "Load raster band for processing", None, QtGui.QApplication.UnicodeUTF8))
         self.btnLoad.setText(QtGui.QApplication.translate("Form", "Load Band", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelCache.setToolTip(QtGui.QApplication.translate("Form", "Memory used by loaded bands", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelCache.setText(QtGui.QApplication.translate("Form", "Band cache:", None, QtGui.QApplication.UnicodeUTF8))
         self.btn0.setText(QtGui.QApplication.translate("Form", "0", None, QtGui.QApplication.UnicodeUTF8))
         self.btnAddition.setToolTip(QtGui.QApplication.translate("Form", "Add", None, QtGui.QApplication.UnicodeUTF8))
         self.btnAddition.setText(QtGui.QApplication.translate("Form", "+", None, QtGui.QApplication.UnicodeUTF8))
@@ -259,7 +324,42 @@ class Ui_Form(object):
         self.btnSubtract.setText(QtGui.QApplication.translate("Form", "-", None, QtGui.QApplication.UnicodeUTF8))
         self.checkBoxQGIS.setToolTip(QtGui.QApplication.translate("Form", "Add new raster to QGIS layers", None, QtGui.QApplication.UnicodeUTF8))
         self.checkBoxQGIS.setText(QtGui.QApplication.translate("Form", "Add new raster to QGIS", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBoxStream.setToolTip(QtGui.QApplication.translate("Form", "Calculate and write the output in tiles to reduce memory use", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBoxStream.setText(QtGui.QApplication.translate("Form", "Process in tiles (low memory)", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBoxProfile.setToolTip(QtGui.QApplication.translate("Form", "Show time, data read and written and memory used by each stage after a calculation or script", None, QtGui.QApplication.UnicodeUTF8))
+        self.checkBoxProfile.setText(QtGui.QApplication.translate("Form", "Profile", None, QtGui.QApplication.UnicodeUTF8))
         self.labeloutformat.setText(QtGui.QApplication.translate("Form", "Output format", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelCompression.setText(QtGui.QApplication.translate("Form", "Compression", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboCompression.setToolTip(QtGui.QApplication.translate("Form", "Select output file compression", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboCompression.setItemText(0, QtGui.QApplication.translate("Form", "None", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboCompression.setItemText(1, QtGui.QApplication.translate("Form", "LZW", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboCompression.setItemText(2, QtGui.QApplication.translate("Form", "DEFLATE", None, QtGui.QApplication.UnicodeUTF8))
+        self.btnPreview.setToolTip(QtGui.QApplication.translate("Form", "Quick look at the result, calculated on reduced resolution bands", None, QtGui.QApplication.UnicodeUTF8))
+        self.btnPreview.setText(QtGui.QApplication.translate("Form", "Preview", None, QtGui.QApplication.UnicodeUTF8))
+        self.btnCancel.setToolTip(QtGui.QApplication.translate("Form", "Stop the running calculation", None, QtGui.QApplication.UnicodeUTF8))
+        self.btnCancel.setText(QtGui.QApplication.translate("Form", "Cancel", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelDtype.setText(QtGui.QApplication.translate("Form", "Data type", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setToolTip(QtGui.QApplication.translate("Form", "Select output data type (Auto keeps the data type of the result)", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(0, QtGui.QApplication.translate("Form", "Auto", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(1, QtGui.QApplication.translate("Form", "Smallest", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(2, QtGui.QApplication.translate("Form", "Byte", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(3, QtGui.QApplication.translate("Form", "UInt16", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(4, QtGui.QApplication.translate("Form", "Int16", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(5, QtGui.QApplication.translate("Form", "UInt32", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(6, QtGui.QApplication.translate("Form", "Int32", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(7, QtGui.QApplication.translate("Form", "Float32", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboDtype.setItemText(8, QtGui.QApplication.translate("Form", "Float64", None, QtGui.QApplication.UnicodeUTF8))
+        self.labelOverviews.setText(QtGui.QApplication.translate("Form", "Overviews", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboOverviews.setToolTip(QtGui.QApplication.translate("Form", "Build overviews (pyramids) of the new raster for fast display", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboOverviews.setItemText(0, QtGui.QApplication.translate("Form", "None", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboOverviews.setItemText(1, QtGui.QApplication.translate("Form", "Internal", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboOverviews.setItemText(2, QtGui.QApplication.translate("Form", "External (.ovr)", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboResampling.setToolTip(QtGui.QApplication.translate("Form", "Resampling method of overviews", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboResampling.setItemText(0, QtGui.QApplication.translate("Form", "Average", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboResampling.setItemText(1, QtGui.QApplication.translate("Form", "Nearest", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboResampling.setItemText(2, QtGui.QApplication.translate("Form", "Mode", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboResampling.setItemText(3, QtGui.QApplication.translate("Form", "Gauss", None, QtGui.QApplication.UnicodeUTF8))
+        self.comboResampling.setItemText(4, QtGui.QApplication.translate("Form", "Cubic", None, QtGui.QApplication.UnicodeUTF8))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.tab), QtGui.QApplication.translate("Form", "Processor", None, QtGui.QApplication.UnicodeUTF8))
         self.btnClearScript.setToolTip(QtGui.QApplication.translate("Form", "Clear Python script", None, QtGui.QApplication.UnicodeUTF8))
         self.btnClearScript.setText(QtGui.QApplication.translate("Form", "Clear", None, QtGui.QApplication.UnicodeUTF8))
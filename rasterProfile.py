@@ -0,0 +1,165 @@
+''' Timers and counters of the stages of raster reading, calculation and writing.
+
+rasterProfile
+=============
+
+rasterIO, rasterCalc, rasterCache and rasterStats time each stage of their work (opening files, reading,
+masking, compiling and evaluating equations, re-masking NoDataValues, writing and building overviews) and
+count bytes read and written, pixels processed, tiles and cache hits. Profiling is off by default; when it is
+off each instrumented stage costs a function call and a test of rasterProfile.ENABLED.
+
+	>>> import rasterProfile
+	>>> rasterProfile.enable()
+	>>> newband = rasterCalc.evaluate("(b2 - b1) / (b2 + b1)", namespace)
+	>>> print rasterProfile.report()
+	>>> stages, counters = rasterProfile.results()
+	>>> rasterProfile.reset()
+
+Stages are timed in the thread doing the work, so the seconds of stages run on several threads (e.g. by
+rasterCalc.writeparallel) are summed over the threads and can exceed the elapsed time.
+Instrumented code brackets each stage with start and stop:
+
+	>>> started = rasterProfile.start()
+	>>> datarray = band.ReadAsArray()
+	>>> rasterProfile.stop('read', started, datarray.nbytes, datarray.size)
+
+License
+-------
+Released under the Simplified BSD License (see LICENSE.txt).
+'''
+__version__ = "1.0.0"
+#!/usr/bin/env python
+import sys, time, threading
+try:
+	import resource
+except ImportError:
+	resource = None
+
+# profiling is on if True, see enable
+ENABLED = False
+# order stages are listed in by report, other stages follow in alphabetical order
+STAGES = ('open', 'read', 'mask', 'compile', 'evaluate', 'eval', 'remask', 'stats', 'write', 'overviews')
+# totals of each stage, value is [calls, seconds, bytes, pixels]
+_stages = {}
+# counters, value is count
+_counters = {}
+# time profiling was enabled or reset, and time it was disabled
+_began = [None]
+_ended = [None]
+_lock = threading.Lock()
+
+# function to switch profiling on or off
+def enable(on=True):
+	'''Accepts True to switch profiling on or False to switch it off. Totals are kept until reset.'''
+	global ENABLED
+	if on and _began[0] == None:
+		_began[0] = time.time()
+	if on:
+		_ended[0] = None
+	elif ENABLED:
+		_ended[0] = time.time()
+	ENABLED = bool(on)
+
+# function to switch profiling off
+def disable():
+	'''Switches profiling off, totals are kept until reset.'''
+	enable(False)
+
+# function to clear totals
+def reset():
+	'''Clears totals of all stages and counters.'''
+	_lock.acquire()
+	try:
+		_stages.clear()
+		_counters.clear()
+		_began[0] = None
+		_ended[0] = None
+		if ENABLED:
+			_began[0] = time.time()
+	finally:
+		_lock.release()
+
+# function to start timing a stage
+def start():
+	'''Returns start time to pass to stop, or None if profiling is off.'''
+	if ENABLED:
+		return time.time()
+	return None
+
+# function to stop timing a stage
+def stop(stage, started, nbytes=0, pixels=0):
+	'''Accepts stage name, start time returned by start, bytes and pixels processed by the stage, adds them to the
+	totals of the stage. Does nothing if started is None (profiling was off when the stage started).'''
+	if started == None:
+		return
+	seconds = time.time() - started
+	_lock.acquire()
+	try:
+		totals = _stages.get(stage)
+		if totals == None:
+			totals = _stages[stage] = [0, 0.0, 0, 0]
+		totals[0] += 1
+		totals[1] += seconds
+		totals[2] += nbytes
+		totals[3] += pixels
+	finally:
+		_lock.release()
+
+# function to add to a counter
+def count(name, n=1):
+	'''Accepts counter name and number to add, if profiling is on.'''
+	if not ENABLED:
+		return
+	_lock.acquire()
+	try:
+		_counters[name] = _counters.get(name, 0) + n
+	finally:
+		_lock.release()
+
+# function to get peak resident memory
+def peakrss():
+	'''Returns peak resident memory of the process in bytes, or None if it is not available (e.g. on Windows).'''
+	if resource == None:
+		return None
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == 'darwin':
+		# bytes on Mac OS X, kilobytes on Linux
+		return rss
+	return rss * 1024
+
+# function to get totals
+def results():
+	'''Returns (dict of stage totals {stage:(calls, seconds, bytes, pixels)}, dict of counters {name:count}).'''
+	_lock.acquire()
+	try:
+		stages = dict([(stage, tuple(totals)) for stage, totals in _stages.items()])
+		return stages, dict(_counters)
+	finally:
+		_lock.release()
+
+# function to format totals as a table
+def report():
+	'''Returns table (string) of stage totals, counters, elapsed time and peak memory.'''
+	stages, counters = results()
+	names = [stage for stage in STAGES if stage in stages]
+	names += sorted([stage for stage in stages if stage not in STAGES])
+	lines = ['%-10s %7s %10s %10s %10s %10s' % ('Stage', 'Calls', 'Seconds', 'MB', 'MPixels', 'MPix/s')]
+	for stage in names:
+		calls, seconds, nbytes, pixels = stages[stage]
+		throughput = '-'
+		if pixels > 0 and seconds > 0:
+			throughput = '%.1f' % (pixels / seconds / 1.0e6)
+		lines.append('%-10s %7i %10.3f %10.1f %10.2f %10s' % (stage, calls, seconds, nbytes / 1048576.0, pixels / 1.0e6, throughput))
+	if len(names) < 1:
+		lines.append('(no stages recorded, is profiling enabled?)')
+	for name in sorted(counters.keys()):
+		lines.append('%-22s %i' % (name + ':', counters[name]))
+	if _began[0] != None:
+		ended = _ended[0]
+		if ended == None:
+			ended = time.time()
+		lines.append('%-22s %.3f s' % ('Elapsed:', ended - _began[0]))
+	rss = peakrss()
+	if rss != None:
+		lines.append('%-22s %.0f MB' % ('Peak memory:', rss / 1048576.0))
+	return '\n'.join(lines)
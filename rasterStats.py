@@ -0,0 +1,284 @@
+''' Library of functions to calculate global statistics of raster bands held as Numpy masked arrays or on disk.
+
+rasterStats
+===========
+
+Statistics (count, mean, variance/standard deviation, minimum and maximum of valid pixels) are calculated
+in a single pass over blocks of the raster. Partial results of each block are merged using the numerically
+stable method of Chan et al., so no full size temporary arrays are created.
+Statistics of bands on disk are cached by file name, band number and modification time and size.
+Calculations are timed by rasterProfile (stage 'stats') when it is enabled.
+
+	>>> import rasterStats
+	>>> stats = rasterStats.bandstats('/data/image.tif', 1)
+	>>> stats.mean, stats.std()
+	>>> rasterStats.std(band_1)
+
+Standard deviation and variance are population statistics, as numpy.ma.std and numpy.ma.var.
+
+Summary
+-------
+	A Summary adds the number of masked pixels, a histogram and approximate percentiles to the statistics,
+	also calculated block by block. The histogram has a fixed number of equal width bins whose range is
+	doubled (merging pairs of bins) whenever a block holds values outside it, so its range need not be
+	known in advance. Percentiles are interpolated within the bins and are accurate to about one bin width,
+	(max - min) / HISTOGRAM_BINS or better.
+
+	>>> summary = rasterStats.arraysummary(band_1)
+	>>> summary.percentile(50)
+	>>> print summary.table()
+
+License
+-------
+Released under the Simplified BSD License (see LICENSE.txt).
+'''
+__version__ = "1.0.0"
+#!/usr/bin/env python
+import os
+import numpy as np
+import numpy.ma as ma
+import rasterIO
+import rasterProfile
+
+# number of pixels in each block when calculating statistics of arrays
+BLOCK_PIXELS = 1048576
+# number of bins of histograms, a power of 2
+HISTOGRAM_BINS = 1024
+# percentiles shown in summary tables
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+# cached statistics of bands on disk, key is (file name, band number, modification time)
+_cache = {}
+
+# class to accumulate statistics
+class Stats:
+	'''Running count, mean, sum of squared differences from the mean (M2), minimum and maximum.'''
+
+	def __init__(self):
+		self.count = 0
+		self.mean = 0.0
+		self.M2 = 0.0
+		self.min = None
+		self.max = None
+
+	def add(self, raster):
+		'''Accepts Numpy (masked) array and adds its valid pixels to the statistics.'''
+		if raster.dtype.kind == 'f':
+			raster = ma.masked_invalid(raster)
+		values = ma.compressed(raster)
+		if values.size < 1:
+			return
+		values = values.astype(np.float64)
+		block = Stats()
+		block.count = values.size
+		block.mean = float(values.mean())
+		block.min = float(values.min())
+		block.max = float(values.max())
+		values -= block.mean
+		block.M2 = float(np.dot(values, values))
+		self.merge(block)
+
+	def merge(self, other):
+		'''Accepts Stats and merges them into these statistics.'''
+		if other.count < 1:
+			return
+		if self.count < 1:
+			self.count, self.mean, self.M2, self.min, self.max = other.count, other.mean, other.M2, other.min, other.max
+			return
+		count = self.count + other.count
+		delta = other.mean - self.mean
+		self.mean = self.mean + delta * other.count / count
+		self.M2 = self.M2 + other.M2 + delta * delta * self.count * other.count / count
+		self.count = count
+		self.min = min(self.min, other.min)
+		self.max = max(self.max, other.max)
+
+	def var(self):
+		'''Returns population variance.'''
+		if self.count < 1:
+			return float('nan')
+		return self.M2 / self.count
+
+	def std(self):
+		'''Returns population standard deviation.'''
+		return self.var() ** 0.5
+
+# class to accumulate a histogram of values with unknown range
+class Histogram:
+	'''Counts of values in equal width bins, from lo to lo + bins * width. The range is doubled as needed.'''
+
+	def __init__(self, bins=HISTOGRAM_BINS):
+		self.bins = bins
+		self.counts = np.zeros(bins, np.int64)
+		self.lo = None
+		self.width = None
+
+	def add(self, values):
+		'''Accepts 1D Numpy array of finite values and adds them to the histogram.'''
+		if values.size < 1:
+			return
+		values = np.asarray(values, np.float64)
+		vmin = float(values.min())
+		vmax = float(values.max())
+		if self.lo == None:
+			self.lo = vmin
+			self.width = (vmax - vmin) / self.bins
+			if self.width <= 0:
+				self.width = max(abs(vmin), 1.0) / self.bins
+		while vmin < self.lo:
+			self._grow(True)
+		while vmax > self.lo + self.width * self.bins:
+			self._grow(False)
+		index = ((values - self.lo) / self.width).astype(np.intp)
+		np.clip(index, 0, self.bins - 1, index)
+		self.counts += np.bincount(index, minlength=self.bins)
+
+	def _grow(self, down):
+		# merge pairs of bins into the upper (extending down) or lower half of the bins
+		merged = self.counts.reshape(-1, 2).sum(1)
+		self.counts = np.zeros(self.bins, np.int64)
+		if down:
+			self.counts[self.bins // 2:] = merged
+			self.lo -= self.width * self.bins
+		else:
+			self.counts[:self.bins // 2] = merged
+		self.width *= 2
+
+	def percentile(self, q):
+		'''Accepts percentage (0 to 100), returns value below which q percent of values lie, interpolated within bins.'''
+		total = self.counts.sum()
+		if total < 1:
+			return float('nan')
+		cumulative = np.cumsum(self.counts)
+		target = q / 100.0 * total
+		i = min(int(np.searchsorted(cumulative, target)), self.bins - 1)
+		before = 0
+		if i > 0:
+			before = cumulative[i - 1]
+		fraction = 0.0
+		if self.counts[i] > 0:
+			fraction = float(target - before) / self.counts[i]
+		return self.lo + (i + fraction) * self.width
+
+	def rebin(self, lo, hi, bins):
+		'''Accepts range and number of bins, returns counts of values in that many equal width bins from lo to hi
+		(each bin of the histogram is counted in the bin holding its centre).'''
+		centres = self.lo + (np.arange(self.bins) + 0.5) * self.width
+		if hi > lo:
+			index = ((centres - lo) / (hi - lo) * bins).astype(np.intp)
+		else:
+			index = np.zeros(self.bins, np.intp)
+		np.clip(index, 0, bins - 1, index)
+		return np.bincount(index, weights=self.counts, minlength=bins).astype(np.int64)
+
+# class to accumulate a summary of a raster
+class Summary:
+	'''Number of pixels and masked pixels, Stats and Histogram of valid pixels.'''
+
+	def __init__(self, bins=HISTOGRAM_BINS):
+		self.pixels = 0
+		self.masked = 0
+		self.stats = Stats()
+		self.histogram = Histogram(bins)
+
+	def add(self, raster):
+		'''Accepts Numpy (masked) array and adds its pixels to the summary.'''
+		raster = ma.asanyarray(raster)
+		if raster.dtype.kind == 'f':
+			raster = ma.masked_invalid(raster)
+		values = ma.compressed(raster)
+		self.pixels += raster.size
+		self.masked += raster.size - values.size
+		self.stats.add(values)
+		self.histogram.add(values)
+
+	def percentile(self, q):
+		'''Accepts percentage (0 to 100), returns approximate percentile of valid pixels.'''
+		value = self.histogram.percentile(q)
+		if self.stats.count > 0:
+			value = min(max(value, self.stats.min), self.stats.max)
+		return value
+
+	def table(self, percentiles=PERCENTILES, bins=10, width=30):
+		'''Accepts percentiles, number of histogram bins and width of histogram bars, returns summary as a text table.'''
+		lines = ['%-10s %12i' % ('Pixels', self.pixels), '%-10s %12i' % ('Masked', self.masked)]
+		if self.stats.count < 1:
+			return '\n'.join(lines)
+		for name, value in (('Min', self.stats.min), ('Max', self.stats.max), ('Mean', self.stats.mean), ('Std', self.stats.std())):
+			lines.append('%-10s %12.6g' % (name, value))
+		for q in percentiles:
+			lines.append('%-10s %12.6g' % ('%g%%' % q, self.percentile(q)))
+		counts = self.histogram.rebin(self.stats.min, self.stats.max, bins)
+		step = (self.stats.max - self.stats.min) / float(bins)
+		lines.append('Histogram')
+		for i in range(bins):
+			bar = '#' * int(round(float(width) * counts[i] / max(counts.max(), 1)))
+			lines.append('%12.6g %12i %s' % (self.stats.min + i * step, counts[i], bar))
+		return '\n'.join(lines)
+
+# function to split an array into blocks of rows
+def _blocks(raster):
+	'''Accepts Numpy (masked) array, returns list of blocks of about BLOCK_PIXELS pixels.'''
+	if raster.ndim < 2:
+		return [raster]
+	rows = max(1, BLOCK_PIXELS // max(1, raster.shape[-1]))
+	return [raster[i:i+rows] for i in range(0, raster.shape[0], rows)]
+
+# function to calculate statistics of an array
+def arraystats(raster):
+	'''Accepts Numpy (masked) array, returns Stats of valid pixels, calculated block by block.'''
+	started = rasterProfile.start()
+	stats = Stats()
+	for block in _blocks(ma.asanyarray(raster)):
+		stats.add(block)
+	rasterProfile.stop('stats', started, 0, np.size(raster))
+	return stats
+
+# function to calculate a summary of an array
+def arraysummary(raster, bins=HISTOGRAM_BINS):
+	'''Accepts Numpy (masked) array and number of histogram bins, returns Summary, calculated block by block.'''
+	started = rasterProfile.start()
+	summary = Summary(bins)
+	for block in _blocks(ma.asanyarray(raster)):
+		summary.add(block)
+	rasterProfile.stop('stats', started, 0, np.size(raster))
+	return summary
+
+# function to calculate statistics of a band on disk
+def bandstats(fname, aband):
+	'''Accepts gdal compatible file on disk and band number, returns Stats of valid pixels.
+
+	The band is read tile by tile, reading ahead in a background thread (see rasterIO.Prefetcher).
+	Results are cached until the file is modified.'''
+	# GDAL virtual files (e.g. /vsizip/) have no modification time, they are cached by name
+	key = (os.path.abspath(fname), aband, rasterIO._filesignature(fname))
+	if key not in _cache:
+		rasterProfile.count('stats cache misses')
+		started = rasterProfile.start()
+		stats = Stats()
+		pixels = 0
+		for window, tiles in rasterIO.Prefetcher([(fname, aband)]):
+			stats.add(tiles[0])
+			pixels += tiles[0].size
+		rasterProfile.stop('stats', started, 0, pixels)
+		_cache[key] = stats
+	else:
+		rasterProfile.count('stats cache hits')
+	return _cache[key]
+
+# function to clear cached statistics
+def clearcache():
+	'''Removes all cached statistics of bands on disk.'''
+	_cache.clear()
+
+# function to get global mean of an array
+def mean(raster):
+	'''Accepts Numpy (masked) array, returns mean of valid pixels.'''
+	stats = arraystats(raster)
+	if stats.count < 1:
+		return float('nan')
+	return stats.mean
+
+# function to get global standard deviation of an array
+def std(raster):
+	'''Accepts Numpy (masked) array, returns population standard deviation of valid pixels.'''
+	return arraystats(raster).std()
@@ -41,11 +41,39 @@ license		     : Relseased under Simplified BSD license (see LICENSE.txt)
 # 04/12/2010 - TH - Tidied a few code comments.
 # 05/12/2010 - TH - Added 'Processing...' run status output to Information for Python script execution. 
 # 05/12/2010 - TH - Fixed papercut - added tooltips to buttons in Python script tab.
+#
+# 17/10/2026 - Added 'Process in tiles' option, pixel-wise equations are calculated and written tile by tile (rasterCalc).
+# 17/10/2026 - Equations are compiled by rasterCalc (constant folding, common sub-expressions, chunked evaluation).
+#		- EquationError messages describe what is wrong with an equation.
+# 17/10/2026 - mean and std buttons use rasterStats (single pass, cached statistics of loaded bands).
+# 17/10/2026 - Layers are opened with rasterIO.openpooledraster, reusing open datasets.
+#		- Only worker jobs use pooled datasets, the GUI thread opens its own (band counts).
+# 17/10/2026 - Loaded bands are held in a memory limited band cache (rasterCache) instead of globals().
+# 17/10/2026 - Output files are tiled, with a choice of compression (rasterIO.RasterWriter).
+# 17/10/2026 - Bands keep their native data type, with a choice of output data type.
+#		- Python script output uses rasterCalc.evaluate, so scripts use the same data types as the calculator.
+# 17/10/2026 - Tiles are calculated on a pool of threads (rasterCalc.writeparallel).
+# 17/10/2026 - Calculations and band loads run in a worker thread, with a progress bar and Cancel button.
+#		- Partially written output files are removed when a calculation fails or is cancelled.
+# 17/10/2026 - Information messages are buffered and shown in batches (LogBuffer), keeping the last LOG_LINES lines,
+#		optionally mirrored to LOG_FILE.
+# 17/10/2026 - Running without creating a new file shows a summary of the result (rasterStats.Summary): pixel counts,
+#		statistics, percentiles and histogram, calculated tile by tile for pixel-wise equations.
+# 17/10/2026 - Added Preview button, evaluating the equation on reduced resolution bands (read from overviews)
+#		and showing a summary and quick-look layer before the full resolution run.
+#		- Quick-look layers are removed from QGIS when the dialog is closed, before their files are deleted.
+# 17/10/2026 - Overviews (internal or external .ovr) of new rasters are built in the worker thread before
+#		the raster is added to QGIS (rasterIO.buildoverviews).
+# 17/10/2026 - New rasters are written with the projection (well known text) of the input, not its EPSG code.
+# 17/10/2026 - rasterIO, Numpy and GDAL are imported when the dialog is first opened, not when QGIS loads the plugin.
+#		- Layers are listed without opening them, band counts are read when a layer is selected and cached.
+# 17/10/2026 - Added Profile option, showing time, bytes, pixels, cache hits and peak memory of each stage
+#		(rasterProfile) in the Information box after each calculation and script.
 
 # Import the PyQt libraries
 from PyQt4 import QtCore, QtGui
 # Import standard libraries 
-import sys, os, string
+import sys, os, string, threading, tempfile, shutil
 from os.path import isfile
 # Import QGIS core
 from qgis.core import *
@@ -54,52 +82,191 @@ import qgis
 import resources
 # Import the dialog
 from rasterProcessor_ui import Ui_Form
-# rasterIO and associates 
-import rasterIO
-import numpy.ma as ma
 from datetime import datetime
 import __init__ as initfile
 version = initfile.version
-rasterIO_version = rasterIO.__version__
+# rasterIO and associates (GDAL, Numpy) are imported by loadlibraries when the dialog is first opened
+rasterIO = rasterCalc = rasterCache = rasterStats = rasterProfile = None
+mean = std = np = ma = None
+rasterIO_version = None
+# file and band number of each band loaded into the equation editor
+bandsources = {}
+# cache of bands loaded into the equation editor
+bandcache = None
+# band count of each layer, read when the layer is first selected
+bandcounts = {}
+
+# function to get the id of a layer in the map layer registry
+def maplayerid(layer):
+	# QgsMapLayer.id replaced getLayerID in QGIS 1.7
+	if hasattr(layer, 'id'):
+		return layer.id()
+	return layer.getLayerID()
+
+# Import rasterIO and associates, they are used as module globals (and by equations and scripts)
+def loadlibraries():
+	global rasterIO, rasterCalc, rasterCache, rasterStats, rasterProfile, mean, std, np, ma, rasterIO_version, bandcache
+	if bandcache != None:
+		return
+	import rasterIO
+	import rasterCalc
+	import rasterCache
+	import rasterStats
+	import rasterProfile
+	from rasterStats import mean, std
+	import numpy as np
+	import numpy.ma as ma
+	rasterIO_version = rasterIO.__version__
+	bandcache = rasterCache.BandCache()
+# milliseconds between updates of the Information box
+LOG_INTERVAL = 100
+# number of lines kept in the Information box
+LOG_LINES = 5000
+# file the full log is appended to, None for no file
+LOG_FILE = None
+# Class to buffer messages and show them in a text box in batches.
+# Messages can be written from any thread, the text box is updated by a timer in the GUI thread.
+class LogBuffer(QtCore.QObject):
+	
+	def __init__(self, edit, maxlines=LOG_LINES, logfile=LOG_FILE, interval=LOG_INTERVAL):
+		"""
+		Keeps the last maxlines lines in edit, older lines are removed. The full log is appended to logfile if given.
+		"""
+		QtCore.QObject.__init__(self, edit)
+		self.edit = edit
+		self.maxlines = maxlines
+		self.edit.document().setMaximumBlockCount(maxlines)
+		self.logfile = None
+		if logfile != None:
+			try:
+				self.logfile = open(logfile, 'a')
+			except IOError:
+				pass
+		# (colour, text) of messages not yet shown
+		self.pending = []
+		self.lock = threading.Lock()
+		self.timer = QtCore.QTimer(self)
+		QtCore.QObject.connect(self.timer, QtCore.SIGNAL("timeout()"), self.flush)
+		self.timer.start(interval)
+
+	def write(self, m, colour=QtCore.Qt.black):
+		self.lock.acquire()
+		try:
+			self.pending.append((colour, m))
+		finally:
+			self.lock.release()
+
+	def flush(self):
+		self.lock.acquire()
+		try:
+			pending = self.pending
+			self.pending = []
+		finally:
+			self.lock.release()
+		if len(pending) < 1:
+			return
+		if self.logfile != None:
+			self.logfile.write(''.join([m for colour, m in pending]))
+			self.logfile.flush()
+		# skip messages which would be removed from the text box straight away
+		lines = 0
+		first = len(pending)
+		while first > 0 and lines <= self.maxlines:
+			first -= 1
+			lines += pending[first][1].count('\n')
+		# insert runs of messages of the same colour at once
+		cursor = QtGui.QTextCursor(self.edit.document())
+		cursor.movePosition(QtGui.QTextCursor.End)
+		text = []
+		for i in range(first, len(pending)):
+			colour, m = pending[i]
+			text.append(m)
+			if i + 1 == len(pending) or pending[i + 1][0] != colour:
+				textformat = QtGui.QTextCharFormat()
+				textformat.setForeground(QtGui.QBrush(QtGui.QColor(colour)))
+				cursor.insertText(''.join(text), textformat)
+				text = []
+		self.edit.moveCursor(QtGui.QTextCursor.End)
+
+	def close(self):
+		self.timer.stop()
+		self.flush()
+		if self.logfile != None:
+			self.logfile.close()
+			self.logfile = None
+
 # Classes for redicreting stdout, stderr.
 class StdOutLog:
+	colour = QtCore.Qt.black
 			
-	def __init__(self, edit, out):
+	def __init__(self, log, out):
 		"""
 		http://www.riverbankcomputing.com/pipermail/pyqt/2009-February/022025.html
 		"""
-		self.edit = edit
+		self.log = log
 		self.out = out
-		
 
 	def write(self, m):
-	    	self.edit.setTextColor(QtCore.Qt.black)
-		self.edit.insertPlainText( m )
-		self.edit.moveCursor(QtGui.QTextCursor.End)
+		self.log.write(m, self.colour)
+
+	def flush(self):
+		pass
 	
-class StdErrLog:
-			
-	def __init__(self, edit, out):
+class StdErrLog(StdOutLog):
+	colour = QtCore.Qt.red
+
+# Exception raised in the worker thread when the user cancels a job
+class Cancelled(Exception):
+	pass
+
+# Class to run a job in a worker thread, keeping the dialog responsive
+class Worker(QtCore.QThread):
+	
+	def __init__(self, job, parent=None):
 		"""
-		http://www.riverbankcomputing.com/pipermail/pyqt/2009-February/022025.html
+		job is called in the worker thread with this worker, and should pass worker.progress as the
+		progress function of long running calls. Result (or exception info) is kept for the finished handler.
 		"""
-		self.edit = edit
-		self.out = out
+		QtCore.QThread.__init__(self, parent)
+		self.job = job
+		self.result = None
+		self.error = None
+		self.cancelled = False
+		self.percent = -1
 
-	def write(self, m):
-	    	self.edit.setTextColor(QtCore.Qt.red)
-		self.edit.insertPlainText( m )
-		self.edit.moveCursor(QtGui.QTextCursor.End)
+	def cancel(self):
+		self.cancelled = True
+
+	def progress(self, done, total):
+		# called from the job, stops it at the next tile or strip if cancelled
+		if self.cancelled:
+			raise Cancelled()
+		percent = int(100 * done / max(total, 1))
+		if percent != self.percent:
+			self.percent = percent
+			self.emit(QtCore.SIGNAL("progress(int)"), percent)
+
+	def run(self):
+		try:
+			self.result = self.job(self)
+		except:
+			self.error = sys.exc_info()
 
 
 class StartQT4(QtGui.QDialog):
 	def __init__(self):
 		QtGui.QDialog.__init__(self)
+		loadlibraries()
 		self.ui = Ui_Form ()
 		self.ui.setupUi(self)
-		sys.stdout = StdOutLog( self.ui.textInformation, sys.stdout)
-		sys.stderr = StdErrLog( self.ui.textInformation, sys.stderr)		
+		self.log = LogBuffer(self.ui.textInformation, LOG_LINES, LOG_FILE, LOG_INTERVAL)
+		sys.stdout = StdOutLog( self.log, sys.stdout)
+		sys.stderr = StdErrLog( self.log, sys.stderr)		
 		sys.stdout.write(str(datetime.now().strftime("%d-%m-%Y %H:%M\n")))
+		self.worker = None
+		# directory of quick-look files created by preview, and ids of their layers in QGIS
+		self.previewdir = None
+		self.previewlayers = []
 		#conect signals and slots
 		QtCore.QObject.connect(self.ui.listWidget_Layers,QtCore.SIGNAL("itemClicked(QListWidgetItem*)"),self.get_band_list)
 		QtCore.QObject.connect(self.ui.listWidget_Layers,QtCore.SIGNAL("itemChanged(QListWidgetItem*)"),self.get_band_list)	
@@ -107,6 +274,8 @@ class StartQT4(QtGui.QDialog):
 		QtCore.QObject.connect(self.ui.btnLoad,QtCore.SIGNAL("released()"),self.load_band)
 		QtCore.QObject.connect(self.ui.btnRun,QtCore.SIGNAL("pressed()"),self.run_status)		
 		QtCore.QObject.connect(self.ui.btnRun,QtCore.SIGNAL("released()"),self.run)
+		QtCore.QObject.connect(self.ui.btnCancel,QtCore.SIGNAL("clicked()"),self.cancel)
+		QtCore.QObject.connect(self.ui.btnPreview,QtCore.SIGNAL("clicked()"),self.preview)
 		QtCore.QObject.connect(self.ui.btnClear,QtCore.SIGNAL("pressed()"),self.clear_EqEdit)
 		QtCore.QObject.connect(self.ui.btnSave,QtCore.SIGNAL("clicked()"),self.save_file_dialog)
 		QtCore.QObject.connect(self.ui.checkBoxGenerateOutput,QtCore.SIGNAL("toggled(bool)"),self.disable_output)
@@ -146,34 +315,53 @@ class StartQT4(QtGui.QDialog):
 		#self.ui.textPyout.setTextColor(QtCore.Qt.blue)
 		self.ui.textPyout.insertPlainText('#!/usr/bin/env python\n')
 		self.ui.textPyout.insertPlainText('import rasterIO\n')
-		self.ui.textPyout.insertPlainText('import numpy.ma as ma\n\n')
+		self.ui.textPyout.insertPlainText('import rasterCalc\n')
+		self.ui.textPyout.insertPlainText('import numpy.ma as ma\n')
+		self.ui.textPyout.insertPlainText('from rasterStats import mean, std\n\n')
 		#self.ui.textPyout.setTextColor(QtCore.Qt.black)
 			
 	# Add band function	
+	# Layers are listed without opening them, files are opened when a layer is selected (see get_band_list)
 	def add_band(self):
 		self.layermap = QgsMapLayerRegistry.instance().mapLayers()
 		for (name, layer) in self.layermap.iteritems():
 			if type(layer).__name__ == "QgsRasterLayer":
-				raster =  layer.source()
-				try:
-					raster_str = str(raster)
-					rasterIO.opengdalraster(raster_str)
-					self.ui.listWidget_Layers.addItem(raster_str)
-					self.ui.listWidget_Layers.setCurrentRow(0)
-					self.get_band_list()
-				except IOError:
-					sys.stderr.write('IOError from file: ')
-					sys.stderr.write(raster_str)
-					sys.stderr.write('\n')
+				raster_str = str(layer.source())
+				self.ui.listWidget_Layers.addItem(raster_str)
+		if self.ui.listWidget_Layers.count() > 0:
+			self.ui.listWidget_Layers.setCurrentRow(0)
+			self.get_band_list()
 	def write(self,astring):
-		self.ui.textInformation.append(astring)
+		self.log.write(astring + '\n')
+	# Show remaining messages and restore stdout, stderr when the dialog is closed
+	def done(self, result):
+		if self.worker != None:
+			# stop the running job and wait for it, jobs remove their partial output files when cancelled
+			QtCore.QObject.disconnect(self.worker, QtCore.SIGNAL("finished()"), self.worker_done)
+			self.worker.cancel()
+			self.worker.wait()
+			self.worker = None
+			self.set_busy(False)
+			rasterProfile.disable()
+		self.log.close()
+		# quick-look layers must not point at deleted files
+		for layerid in self.previewlayers:
+			QgsMapLayerRegistry.instance().removeMapLayer(layerid)
+		self.previewlayers = []
+		if self.previewdir != None:
+			shutil.rmtree(self.previewdir, True)
+		if isinstance(sys.stdout, StdOutLog):
+			sys.stdout = sys.stdout.out
+		if isinstance(sys.stderr, StdOutLog):
+			sys.stderr = sys.stderr.out
+		QtGui.QDialog.done(self, result)
 	def exit(self):
 		quit()
 	def load_band_status(self):
 		sys.stdout.write('Reading raster data...\n')
 	# Math functions
 	def insertStDev(self):
-		self.ui.textEqEdit.insertPlainText(" ma.std( )")
+		self.ui.textEqEdit.insertPlainText(" std( )")
 		self.ui.textEqEdit.moveCursor(QtGui.QTextCursor.PreviousCharacter)
 		#self.ui.statusbar.showMessage("Band standard deviation from Masked Array (ma) numerical library",4000)
 	def insertRbracket(self):
@@ -189,7 +377,7 @@ class StartQT4(QtGui.QDialog):
 		self.ui.textEqEdit.moveCursor(QtGui.QTextCursor.PreviousCharacter)
 		self.ui.textEqEdit.moveCursor(QtGui.QTextCursor.PreviousCharacter)
 	def insertMean(self):
-		self.ui.textEqEdit.insertPlainText(" ma.mean( )")
+		self.ui.textEqEdit.insertPlainText(" mean( )")
 		self.ui.textEqEdit.moveCursor(QtGui.QTextCursor.PreviousCharacter)
 	def insertAdd(self):
 		self.ui.textEqEdit.insertPlainText("+ ")
@@ -226,21 +414,39 @@ class StartQT4(QtGui.QDialog):
 			self.ui.btnSave.setEnabled(False)
 			self.ui.lineOutfile.setEnabled(False)
 			self.ui.comboFormats.setEnabled(False)
+			self.ui.comboCompression.setEnabled(False)
+			self.ui.comboDtype.setEnabled(False)
+			self.ui.comboOverviews.setEnabled(False)
+			self.ui.comboResampling.setEnabled(False)
 			self.ui.checkBoxQGIS.setEnabled(False)
+			self.ui.checkBoxStream.setEnabled(False)
 			self.ui.labelSaveNewRaster.setEnabled(False)
 		else:
 			self.ui.btnSave.setEnabled(True)
 			self.ui.lineOutfile.setEnabled(True)
 			self.ui.comboFormats.setEnabled(True)
+			self.ui.comboCompression.setEnabled(True)
+			self.ui.comboDtype.setEnabled(True)
+			self.ui.comboOverviews.setEnabled(True)
+			self.ui.comboResampling.setEnabled(True)
 			self.ui.checkBoxQGIS.setEnabled(True)
+			self.ui.checkBoxStream.setEnabled(True)
 			self.ui.labelSaveNewRaster.setEnabled(True)
 	# Get a list of bands available in the raster	
 	def get_band_list(self):
 		if (self.ui.listWidget_Layers.count() > 0):
 			fname = self.ui.listWidget_Layers.currentItem().text()
 			fname_Str = str(fname)
-			inraster = rasterIO.opengdalraster(fname_Str)
-			numbands = inraster.RasterCount
+			if fname_Str not in bandcounts:
+				try:
+					# pooled datasets are used by worker jobs, the GUI thread opens its own
+					bandcounts[fname_Str] = rasterIO.opengdalraster(fname_Str).RasterCount
+				except IOError:
+					sys.stderr.write('IOError from file: ')
+					sys.stderr.write(fname_Str)
+					sys.stderr.write('\n')
+					return
+			numbands = bandcounts[fname_Str]
 			self.ui.comboBands.clear()
 			self.ui.comboBands.addItem("Band #")		
 			for i in range(1,numbands +1):
@@ -264,24 +470,47 @@ class StartQT4(QtGui.QDialog):
 				cleaname_a = string.replace(basename, '.', '_') 
 				cleaname = string.replace(cleaname_a, '-', '_')
 				newname = cleaname+'_'+str(band_num)	
-				rasterpointer = rasterIO.opengdalraster(fname_Str)
-				global driver, XSize, YSize, proj, geotrans		
-				global bandname
-				bandname = newname
-				globals()[bandname] = rasterIO.readrasterband(rasterpointer, band_num)
-				driver, XSize, YSize, proj, geotrans = rasterIO.readrastermeta(rasterpointer)		
-				self.ui.textEqEdit.insertPlainText(bandname+" ")
-				sys.stdout.write("Loaded: ")
-				sys.stdout.write(str(fname_Str))
-				sys.stdout.write(", band: ")
-				sys.stdout.write(str(band_num))
-				sys.stdout.write("\n")
-				self.ui.textPyout.insertPlainText('# open a file pointer\n')
-				self.ui.textPyout.insertPlainText('rasterpointer = rasterIO.opengdalraster("%s")\n' %(fname_Str))
-				self.ui.textPyout.insertPlainText('# read a raster band\n')
-				self.ui.textPyout.insertPlainText('%s = rasterIO.readrasterband(rasterpointer, %i)\n' %(bandname, band_num))
-				self.ui.textPyout.insertPlainText('# get file metadata: format, X, Y, projection, geo-parameters\n')
-				self.ui.textPyout.insertPlainText('driver, XSize, YSize, proj, geotrans = rasterIO.readrastermeta(rasterpointer)\n\n')
+				# read the band in the worker thread
+				def job(worker):
+					rasterpointer = rasterIO.openpooledraster(fname_Str)
+					bandcache.get(fname_Str, band_num, progress=worker.progress)
+					return rasterIO.readrastermeta(rasterpointer)
+				def finished(worker):
+					if self.job_failed(worker, 'Error: Could not load band.'):
+						return
+					global driver, XSize, YSize, proj, geotrans		
+					global bandname
+					bandname = newname
+					bandsources[bandname] = (fname_Str, band_num)
+					driver, XSize, YSize, proj, geotrans = worker.result
+					self.loaded_band(fname_Str, band_num)
+				self.start_worker(job, finished)
+	# Report a band loaded by load_band
+	def loaded_band(self, fname_Str, band_num):
+		self.ui.textEqEdit.insertPlainText(bandname+" ")
+		sys.stdout.write("Loaded: ")
+		sys.stdout.write(str(fname_Str))
+		sys.stdout.write(", band: ")
+		sys.stdout.write(str(band_num))
+		sys.stdout.write("\n")
+		self.show_cache_usage()
+		self.ui.textPyout.insertPlainText('# open a file pointer\n')
+		self.ui.textPyout.insertPlainText('rasterpointer = rasterIO.opengdalraster("%s")\n' %(fname_Str))
+		self.ui.textPyout.insertPlainText('# read a raster band\n')
+		self.ui.textPyout.insertPlainText('%s = rasterIO.readrasterband(rasterpointer, %i)\n' %(bandname, band_num))
+		self.ui.textPyout.insertPlainText('# get file metadata: format, X, Y, projection, geo-parameters\n')
+		self.ui.textPyout.insertPlainText('driver, XSize, YSize, proj, geotrans = rasterIO.readrastermeta(rasterpointer)\n\n')
+	# Get namespace for an equation, with the bands it uses read through the band cache
+	def get_namespace(self, eqstring):
+		namespace = dict(globals())
+		for name in rasterCalc.equationnames(eqstring):
+			if name in bandsources:
+				namespace[name] = bandcache.get(*bandsources[name])
+		return namespace
+	# Show memory used by band cache
+	def show_cache_usage(self):
+		inmemory, budget, nbands, nspilled = bandcache.usage()
+		self.ui.labelCache.setText('Band cache:\n%.0f / %.0f MB\n%i band(s)' % (inmemory / 1048576.0, budget / 1048576.0, nbands))
 	# print user information that process is running			
 	def run_status(self):
 		sys.stdout.write('Processing...\n')
@@ -290,69 +519,215 @@ class StartQT4(QtGui.QDialog):
 		# Get inputs
 		outname = str(self.ui.lineOutfile.text())
 		eqstring = str(self.ui.textEqEdit.toPlainText())
+		output = self.ui.checkBoxGenerateOutput.isChecked() == False
 		# Basic user validation
 		if (len(eqstring) < 1):
 			sys.stderr.write('Error: No equation to process.\n')
 		elif(self.ui.listWidget_Layers.count() < 1):
 			sys.stderr.write('Error: No input files.\n')
+		elif output == True and (len(outname) < 1):
+			sys.stderr.write('Error: No output filename specified.\n')
 		# Process to new file	
 		else:	
-			try:
+			# setup python dictionary of rgdal formats and drivers
+			formats = {'GeoTiff (.tif)':'.tif','Erdas Imagine (.img)':'.img'}
+			drivers = {'GeoTiff (.tif)':'GTiff','Erdas Imagine (.img)':'HFA'}
+			out_ext = formats[str(self.ui.comboFormats.currentText())]
+			driver = drivers[str(self.ui.comboFormats.currentText())]
+			outfile = outname + out_ext
+			compress = str(self.ui.comboCompression.currentText())
+			dtype = str(self.ui.comboDtype.currentText())
+			if dtype == 'Auto':
+				dtype = None
+			tiles = self.ui.checkBoxStream.isChecked()
+			# overviews: None, or (external flag, resampling method)
+			overviews = None
+			if str(self.ui.comboOverviews.currentText()) != 'None':
+				overviews = (str(self.ui.comboOverviews.currentText()) != 'Internal', str(self.ui.comboResampling.currentText()).upper())
+			profile = self.ui.checkBoxProfile.isChecked()
+			# calculate in the worker thread, widgets are only used by the finished handler
+			def job(worker):
+				if profile == True:
+					self.start_profile()
+				namespace = self.get_namespace(eqstring)
 				# Test if output box is checked
-				if self.ui.checkBoxGenerateOutput.isChecked() == False:
-					if (len(outname) < 1):
-						sys.stderr.write('Error: No output filename specified.\n')
-					else:
-						newband = eval(eqstring)
+				if output == False:
+					return rasterCalc.summarize(eqstring, namespace, bandsources, progress=worker.progress)
+				# Process in tiles if the equation is pixel-wise
+				stream = tiles and rasterCalc.streamable(eqstring, namespace, bandsources)
+				if stream == True:
+					rasterCalc.writeparallel(eqstring, namespace, outfile, driver, XSize, YSize, geotrans, proj, sources=bandsources, compress=compress, dtype=dtype, progress=worker.progress)
+				else:
+					newband = rasterCalc.evaluate(eqstring, namespace, bandsources, progress=worker.progress)
+					if newband.dtype.kind == 'f':
+						started = rasterProfile.start()
 						newband = ma.masked_values(newband, 9999.0)
-						epsg = rasterIO.wkt2epsg(proj)
-						# setup python dictionary of rgdal formats and drivers
-						formats = {'GeoTiff (.tif)':'.tif','Erdas Imagine (.img)':'.img'}
-						drivers = {'GeoTiff (.tif)':'GTiff','Erdas Imagine (.img)':'HFA'}
-						out_ext = formats[str(self.ui.comboFormats.currentText())]
-						driver = drivers[str(self.ui.comboFormats.currentText())]
-						outfile = outname + out_ext
-						#driver = 'GTiff'
-						rasterIO.writerasterband(newband, outfile, driver, XSize, YSize, geotrans, epsg)
-						sys.stdout.write('Process complete, created newfile ')
-						sys.stdout.write(str(outfile))
-						sys.stdout.write('\n')
-						if self.ui.checkBoxQGIS.isEnabled() == True:
-							qgis.utils.iface.addRasterLayer(outfile)
-						self.ui.textPyout.insertPlainText('# create a new matrix from equation\n')
-						self.ui.textPyout.insertPlainText('newband = %s\n' %(eqstring))
-						self.ui.textPyout.insertPlainText('# get the epsg code from the projection\n')
-						self.ui.textPyout.insertPlainText('epsg = rasterIO.wkt2epsg(proj)\n')
-						self.ui.textPyout.insertPlainText('# set the gdal driver / output file type\n')
-						self.ui.textPyout.insertPlainText('driver = "%s"\n' %(driver))
-						self.ui.textPyout.insertPlainText('# specify the new output file\n')
-						self.ui.textPyout.insertPlainText('outfile = "%s"\n' %(outfile))
-						self.ui.textPyout.insertPlainText('# write the new matrix to the new file\n')
-						self.ui.textPyout.insertPlainText('rasterIO.writerasterband(newband, outfile, driver, XSize, YSize, geotrans, epsg)\n\n')
-						self.ui.textPyout.insertPlainText('# add the new file to qgis\n')
-						self.ui.textPyout.insertPlainText('qgis.utils.iface.addRasterLayer(outfile)\n\n')
+						rasterProfile.stop('remask', started, 0, newband.size)
+					rasterIO.writerasterband(newband, outfile, driver, XSize, YSize, geotrans, proj, compress, dtype=dtype, progress=worker.progress)
+				if overviews != None:
+					external, resampling = overviews
+					try:
+						rasterIO.buildoverviews(outfile, resampling=resampling, external=external, compress=compress, progress=worker.progress)
+					except Cancelled:
+						# the new raster is complete, only its overviews are missing
+						return 'Overviews cancelled.'
+			def finished(worker):
+				self.run_finished(worker, eqstring, output, outfile, driver, compress, dtype, overviews)
+				if profile == True:
+					self.show_profile()
+			self.start_worker(job, finished)
+	# report results of a calculation started by run
+	def run_finished(self, worker, eqstring, output, outfile, driver, compress, dtype, overviews=None):
+		try:
+			if worker.error != None:
+				raise worker.error[0], worker.error[1], worker.error[2]
+			self.show_cache_usage()
+			if output == True:
+				sys.stdout.write('Process complete, created newfile ')
+				sys.stdout.write(str(outfile))
+				sys.stdout.write('\n')
+				if worker.result != None:
+					sys.stderr.write(worker.result + '\n')
+				if self.ui.checkBoxQGIS.isEnabled() == True:
+					qgis.utils.iface.addRasterLayer(outfile)
+				self.ui.textPyout.insertPlainText('# create a new matrix from equation\n')
+				self.ui.textPyout.insertPlainText('newband = rasterCalc.evaluate(%r, globals())\n' %(eqstring))
+				self.ui.textPyout.insertPlainText('# set the gdal driver / output file type\n')
+				self.ui.textPyout.insertPlainText('driver = "%s"\n' %(driver))
+				self.ui.textPyout.insertPlainText('# specify the new output file\n')
+				self.ui.textPyout.insertPlainText('outfile = "%s"\n' %(outfile))
+				self.ui.textPyout.insertPlainText('# write the new matrix to the new file, with the projection of the input\n')
+				self.ui.textPyout.insertPlainText('rasterIO.writerasterband(newband, outfile, driver, XSize, YSize, geotrans, proj, "%s", dtype=%r)\n\n' %(compress, dtype))
+				if overviews != None:
+					self.ui.textPyout.insertPlainText('# build overviews for fast display\n')
+					self.ui.textPyout.insertPlainText('rasterIO.buildoverviews(outfile, resampling="%s", external=%r, compress="%s")\n\n' %(overviews[1], overviews[0], compress))
+				self.ui.textPyout.insertPlainText('# add the new file to qgis\n')
+				self.ui.textPyout.insertPlainText('qgis.utils.iface.addRasterLayer(outfile)\n\n')
+			else:
+				self.ui.textPyout.insertPlainText('# run without output file\n')
+				if isinstance(worker.result, rasterStats.Summary):
+					outputstring = worker.result.table() +'\n'
+					self.ui.textPyout.insertPlainText('print rasterCalc.summarize(%r, globals()).table()\n\n' %(eqstring))
 				else:
-					outputstring = (str(eval(str(self.ui.textEqEdit.toPlainText())))) +'\n'
-					self.ui.textInformation.setTextColor(QtGui.QColor(0,0,255))
-					self.ui.textInformation.insertPlainText(outputstring)
-					self.ui.textInformation.moveCursor(QtGui.QTextCursor.End)
-					self.ui.textPyout.insertPlainText('# run without output file\n')
-					self.ui.textPyout.insertPlainText('print %s\n\n' %(eqstring))
-			except ValueError:
-				sys.stderr.write('Error: Could not perform calculation. Are input rasters same shape and size? Is the output a matrix?\n')
-			except TypeError:
-				sys.stderr.write('Error: Could not perform calculation. Are input rasters loaded?\n')
-			except SyntaxError:
-				sys.stderr.write('Error: Could not perform calculation. Is the equation correct?\n')
-			except AttributeError:
-				sys.stderr.write('Error: Could not perform calculation. Is the output raster correct?\n')
+					outputstring = (str(worker.result)) +'\n'
+					self.ui.textPyout.insertPlainText('print rasterCalc.evaluate(%r, globals())\n\n' %(eqstring))
+				self.log.write(outputstring, QtGui.QColor(0,0,255))
+		except Cancelled:
+			sys.stderr.write('Calculation cancelled.\n')
+		except rasterCalc.EquationError, e:
+			sys.stderr.write('Error: Could not perform calculation. ')
+			sys.stderr.write(str(e))
+			sys.stderr.write('\n')
+		except ValueError:
+			sys.stderr.write('Error: Could not perform calculation. Are input rasters same shape and size? Is the output a matrix?\n')
+		except TypeError:
+			sys.stderr.write('Error: Could not perform calculation. Are input rasters loaded?\n')
+		except SyntaxError:
+			sys.stderr.write('Error: Could not perform calculation. Is the equation correct?\n')
+		except AttributeError:
+			sys.stderr.write('Error: Could not perform calculation. Is the output raster correct?\n')
+		except IOError, e:
+			sys.stderr.write('Error: Could not perform calculation. ')
+			sys.stderr.write(str(e))
+			sys.stderr.write('\n')
+	# preview the result of an equation on reduced resolution bands
+	def preview(self):
+		eqstring = str(self.ui.textEqEdit.toPlainText())
+		if (len(eqstring) < 1):
+			sys.stderr.write('Error: No equation to process.\n')
+			return
+		elif(self.ui.listWidget_Layers.count() < 1):
+			sys.stderr.write('Error: No input files.\n')
+			return
+		if self.previewdir == None:
+			self.previewdir = tempfile.mkdtemp(prefix='rasterPreview_')
+		outfile = os.path.join(self.previewdir, 'preview_%i.tif' % len(os.listdir(self.previewdir)))
+		sys.stdout.write('Preview...\n')
+		def job(worker):
+			# bands are read at preview size from their files, not from the band cache
+			result = rasterCalc.preview(eqstring, dict(globals()), bandsources)
+			if not isinstance(result, np.ndarray) or result.ndim != 2:
+				return result, None
+			ysize, xsize = result.shape
+			newband = result
+			if newband.dtype.kind == 'f':
+				newband = ma.masked_values(newband, 9999.0)
+			rasterIO.writerasterband(newband, outfile, 'GTiff', xsize, ysize, rasterIO.previewgeotrans(geotrans, XSize, YSize, xsize, ysize), proj)
+			return rasterStats.arraysummary(result), outfile
+		def finished(worker):
+			if self.job_failed(worker, 'Error: Could not preview calculation.'):
+				return
+			result, quicklook = worker.result
+			if quicklook == None:
+				self.log.write(str(result) + '\n', QtGui.QColor(0,0,255))
+				return
+			sys.stdout.write('Preview at reduced resolution:\n')
+			self.log.write(result.table() + '\n', QtGui.QColor(0,0,255))
+			layer = qgis.utils.iface.addRasterLayer(quicklook, 'Preview: ' + eqstring)
+			if layer != None:
+				self.previewlayers.append(maplayerid(layer))
+		self.start_worker(job, finished)
+	# Run job in a worker thread, finished is called with the worker in the GUI thread when it ends
+	def start_worker(self, job, finished):
+		if self.worker != None:
+			sys.stderr.write('Error: Wait for the running job to finish, or cancel it.\n')
+			return
+		self.worker = Worker(job, self)
+		QtCore.QObject.connect(self.worker, QtCore.SIGNAL("progress(int)"), self.ui.progressBar.setValue)
+		def done():
+			worker = self.worker
+			self.worker = None
+			self.set_busy(False)
+			finished(worker)
+		self.worker_done = done
+		QtCore.QObject.connect(self.worker, QtCore.SIGNAL("finished()"), self.worker_done)
+		self.set_busy(True)
+		self.worker.start()
+	# Cancel the running job, it stops at the next tile or strip
+	def cancel(self):
+		if self.worker != None:
+			self.worker.cancel()
+			self.ui.btnCancel.setEnabled(False)
+	# Enable or disable buttons while a job is running
+	def set_busy(self, busy):
+		self.ui.progressBar.setValue(0)
+		self.ui.btnCancel.setEnabled(busy)
+		self.ui.btnRun.setEnabled(not busy)
+		self.ui.btnLoad.setEnabled(not busy)
+		self.ui.btnPreview.setEnabled(not busy)
+	# Report an error or cancellation of a job, returns True if the job did not complete
+	def job_failed(self, worker, message):
+		if worker.error == None:
+			return False
+		if issubclass(worker.error[0], Cancelled):
+			sys.stderr.write('Cancelled.\n')
+		else:
+			sys.stderr.write(message + ' ')
+			sys.stderr.write(str(worker.error[1]))
+			sys.stderr.write('\n')
+		return True
+	# Clear rasterProfile totals and start profiling
+	def start_profile(self):
+		rasterProfile.reset()
+		rasterProfile.enable()
+	# Stop profiling and show the time, bytes, pixels and counters of each stage
+	def show_profile(self):
+		rasterProfile.disable()
+		self.log.write('Profile:\n' + rasterProfile.report() + '\n', QtGui.QColor(0,128,0))
 	# Python script functions			
 	def run_Pyout(self):
+		profile = self.ui.checkBoxProfile.isChecked()
+		if profile == True:
+			self.start_profile()
 		try:
 			commandstring = str(self.ui.textPyout.toPlainText())
-			exec(commandstring)
+			# run the script in its own namespace, so the bands it assigns are in its globals()
+			namespace = dict(globals())
+			exec commandstring in namespace
 		except:
 			sys.stderr.write('Error: There was an error in the script.\n')
+		if profile == True:
+			self.show_profile()
 	def save_file_dialog(self):
 		fd = QtGui.QFileDialog.getSaveFileName(self)
 		self.ui.lineOutfile.insert(fd)	
@@ -362,7 +737,9 @@ class StartQT4(QtGui.QDialog):
 		self.ui.textPyout.clear()
 		self.ui.textPyout.insertPlainText('#!/usr/bin/env python\n')
 		self.ui.textPyout.insertPlainText('import rasterIO\n')
-		self.ui.textPyout.insertPlainText('import numpy.ma as ma\n\n')
+		self.ui.textPyout.insertPlainText('import rasterCalc\n')
+		self.ui.textPyout.insertPlainText('import numpy.ma as ma\n')
+		self.ui.textPyout.insertPlainText('from rasterStats import mean, std\n\n')
 	def save_Pyout(self):
 		try:		
 			#fd = QtGui.QFileDialog.getSaveFileName(self,"Save script", "Python scripts (*.py)")
@@ -406,7 +783,7 @@ class StartQT4(QtGui.QDialog):
 			text = license.read()
 			#sys.stdout.write(text)
 			#print text
-			self.ui.textInformation.insertPlainText(text)
+			self.log.write(text)
 		except IOError:
 			sys.stdout.write("Error: Can't open LICENSE.TXT'.") 
 class RasterProcessingSuite: 
@@ -1,40 +1,26 @@
 #!/usr/bin/env python
-# Import standard modules and rasterIO
-import sys, os, string, rasterIO
+# Import standard modules, rasterIO and rasterBatch
+import sys, os, string, rasterIO, rasterBatch
 
-# Change to data directory
-os.chdir('/user/data/')
+# Create the main function, processes is the number of worker processes (default one per processor)
+def main(processes=None):
 
-# Get a list of files in current directory
-# Create a loop for all files in current directory
+	# Change to data directory
+	os.chdir('/user/data/')
 
-for file in flist:
-	# Check file type (in this case Geotiff)    
-	if file.endswith('.tif'):
-        
-		# Open a pointer to the file
-		pointer = rasterIO.opengdalraster(file)
-		
-		# Read the raster metadata for the new output file
-		driver, XSize, YSize, proj_wkt, geo_t_params = rasterIO.readrastermeta(pointer)
-		
-		# Read the first band to a matrix called band_1
-		band_1 =rasterIO.readrasterband(pointer, 1)
-		
-		# Read the second band to a matrix called band_2
-		band_2 = rasterIO.readrasterband(pointer, 2)
-		
-		# Perform the NDVI calculation and put the results into a new matrix
-		new_ndvi_band = ((band_2 - band_1) / (band_2 + band_1))
+	# Perform the NDVI calculation on the first and second bands (b1 and b2) of every Geotiff
+	# in the current directory, writing each result to a new file called filename_ndvi.tif.
+	# Files are processed in parallel, each worker takes the next file when it finishes a file.
+	results = rasterBatch.runbatch('*.tif', '(b2 - b1) / (b2 + b1)', processes, outpattern='%s_ndvi.tif')
 
-		# Get the input file filename without extension and create a new file name
-		parts = string.split(file)
-		newname ='./'+parts[0]+'_ndvi.tif' # ./filename_ndvi.tif
+	# List the files which could not be processed
+	for result in rasterBatch.failures(results):
+		sys.stderr.write('%s failed\n' % (result.fname))
 
-		# Get the EPSG code from well known text projection
-		epsg =rasterIO.wkt2epsg(proj_wkt)
-		
-		# Write the NDVI matrix to a new raster file
-		rasterIO.writerasterband(new_ndvi_band, newname, XSize, YSize, geo_t_params, epsg)
-    
-# loop will now go to next file in input list
+# Run the batch. Worker processes import this script, so from the command line the batch is run by the
+# main script only. In the plugin's Python tab (not the main script, but the main process) files are
+# processed one by one in the QGIS process.
+if __name__=='__main__':
+	main()
+elif rasterBatch.multiprocessing == None or rasterBatch.multiprocessing.current_process().name == 'MainProcess':
+	main(1)
@@ -1,70 +1,45 @@
 #!/usr/bin/env python
 # Batch processing script with multiprocessing enabled
 
-import sys, os, string, rasterIO
+import sys, os, string, rasterIO, rasterBatch
 
-# Create a function for the process
+# Create a function to process one file (must be defined at module level)
 
-def processfunction(file_list):
-	    
-	# Create a loop for all files in current directory
+def processfunction(file):
 
-	    
-	for file in file_list:
-	    
-		# Check file type (in this case Geotiff)
-		if file.endswith('.tif'):
-			    
-		# Open a pointer to the file
-		pointer = rasterIO.opengdalraster(file)
-			    
-		# Read the raster metadata for the new output file
-		driver, XSize, YSize, proj_wkt, geo_t_params = rasterIO.readrastermeta(pointer)
-			    
-		# Read the first band to a matrix called band_1
-		band_1 = rasterIO.readrasterband(pointer, 1)
-			    
-		# Read the second band to a matrix called band_2
+	# Open a pointer to the file
+	pointer = rasterIO.opengdalraster(file)
 
-		band_2 =rasterIO.readrasterband(pointer, 2)
-			    
-		# Perform the NDVI calculation and put the results into a new matrix
-		new_ndvi_band = ((band_2 - band_1) / (band_2 + band_1))
-			    
-		# Get the input file filename without extension and create a new file name
-		parts =string.split(file)
-		newname = './'+parts[0]+'_ndvi.tif' # ./filename_ndvi.tif
+	# Read the raster metadata for the new output file
+	driver, XSize, YSize, proj_wkt, geo_t_params = rasterIO.readrastermeta(pointer)
 
-	# Get the EPSG code from well known text projection
-	epsg = rasterIO.wkt2epsg(proj_wkt)
-	
-	# Write the NDVI matrix to a new raster file
-	rasterIO.writerasterband(new_ndvi_band, newname, XSize, YSize, geo_t_params, epsg)
-    
-# loop will now go to next file in input list
-# Create a run function to accept jobs from queue
-def processRun(q, filename):
-	q.put(processfunc(filename))
+	# Read the first and second bands (in one pass, as Float32) to matrices called band_1 and band_2
+	band_1, band_2 = rasterIO.readrasterbands(pointer, [1, 2], dtype='float32')
 
-# Create the main function
-def main(arg=sys.argv):
-	# Get a list fo files in the current directory (assumed to contain raster data)
-	file_list = os.listdir(os.getcwd())
-	    
-	# Get the length of the file list
-	len_flist = len(file_list)
-	half_len = len_flist / 2
+	# Perform the NDVI calculation and put the results into a new matrix
+	new_ndvi_band = ((band_2 - band_1) / (band_2 + band_1))
+
+	# Get the input file filename without extension and create a new file name
+	newname = os.path.splitext(file)[0]+'_ndvi.tif' # filename_ndvi.tif
 
-	# Create a queue object
-	q = Queue()
-	    
-	# Create two processes (add more depending on processor availability)
-	p1 = Process(target=processRun, args=(q, flist[:half_len]))
-	p2 =Process(target=processRun, args=(q, flist[half_len:]))
+	# Write the NDVI matrix to a new raster file, with the projection (well known text) of the input
+	rasterIO.writerasterband(new_ndvi_band, newname, 'GTiff', XSize, YSize, geo_t_params, proj_wkt)
 
-	# Start processes
-	p1.start()
-	p2.start()
+	# The returned value is kept in the batch results
+	return newname
+
+# Create the main function
+def main(arg=sys.argv):
+	# Process all Geotiffs in the current directory, one worker process per processor.
+	# Each worker takes the next file from the queue when it finishes a file.
+	results = rasterBatch.runbatch(os.path.join(os.getcwd(), '*.tif'), processfunction)
+
+	# Report files which could not be processed
+	failed = rasterBatch.failures(results)
+	sys.stdout.write('%i files processed, %i failed\n' % (len(results) - len(failed), len(failed)))
+	for result in failed:
+		sys.stderr.write('%s failed\n' % (result.fname))
+	return len(failed)
 
 # Standard Python script execution/exit handling
 
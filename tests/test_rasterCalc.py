@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# Regression tests of rasterCalc: datatypes of results and NoDataValues of results written tile by tile.
+#
+# Usage: python test_rasterCalc.py
+import sys, os, shutil, tempfile, unittest
+import numpy as np
+import numpy.ma as ma
+# rasterCalc lives in the plugin directory above this one
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import rasterIO
+import rasterCalc
+
+class DatatypeTest(unittest.TestCase):
+
+	def setUp(self):
+		self.namespace = {'b1': ma.array(np.array([[0, 2, 65533, 65535]], np.uint16))}
+		self.exact = np.array([[0, 2, 65533, 65535]], np.float64) ** 3
+
+	def test_power_beyond_32_bits(self):
+		result = rasterCalc.evaluate('b1 ** 3', self.namespace)
+		self.assertEqual(result.dtype, np.float64)
+		self.assertTrue(np.all(ma.getdata(result) == self.exact))
+
+	def test_chained_multiply_beyond_32_bits(self):
+		result = rasterCalc.evaluate('b1 * b1 * b1', self.namespace)
+		self.assertEqual(result.dtype, np.float64)
+		self.assertTrue(np.all(ma.getdata(result) == self.exact))
+
+	def test_power_in_32_bits(self):
+		result = rasterCalc.evaluate('b1 ** 2', self.namespace)
+		self.assertEqual(result.dtype, np.uint32)
+
+class DivisionTest(unittest.TestCase):
+
+	def test_compiled_and_eval_division(self):
+		namespace = {'b1': ma.array(np.array([[1, 2, 4]], np.uint8))}
+		rasterCalc.compileequation('b1 * (1 / 2)', namespace)
+		# slicing is not compiled, the equation is evaluated by eval
+		self.assertRaises(rasterCalc.UnsupportedError, rasterCalc.compileequation, 'b1[:] * (1 / 2)', namespace)
+		compiled = rasterCalc.evaluate('b1 * (1 / 2)', namespace)
+		evaluated = rasterCalc.evaluate('b1[:] * (1 / 2)', namespace)
+		self.assertTrue(np.all(ma.getdata(compiled) == [[0.5, 1, 2]]))
+		self.assertTrue(np.all(ma.getdata(evaluated) == ma.getdata(compiled)))
+
+class NamespaceFunctionTest(unittest.TestCase):
+
+	def test_numpy_functions_in_namespace(self):
+		b1 = ma.array(np.array([[1, 4, 9]], np.uint8))
+		namespace = {'b1': b1, 'sqrt': np.sqrt, 'abs': np.absolute, 'maximum': ma.maximum}
+		eqstring = 'maximum(sqrt(abs(b1)), 2)'
+		program = rasterCalc.compileequation(eqstring, namespace)
+		self.assertEqual(program.bands, ['b1'])
+		self.assertTrue(np.all(ma.getdata(rasterCalc.evaluate(eqstring, namespace)) == [[2, 2, 3]]))
+
+	def test_other_functions_in_namespace(self):
+		namespace = {'b1': ma.array(np.array([[1, 4, 9]], np.uint8)), 'sqrt': lambda x: x}
+		self.assertRaises(rasterCalc.UnsupportedError, rasterCalc.compileequation, 'sqrt(b1)', namespace)
+
+class TileNoDataTest(unittest.TestCase):
+
+	def setUp(self):
+		self.tempdir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tempdir, True)
+
+	def readback(self, fname):
+		dataset = rasterIO.opengdalraster(fname)
+		return rasterIO.readrasterband(dataset, 1)
+
+	def test_nodata_in_later_tile(self):
+		# 9999 is a valid pixel of a later tile only
+		data = np.zeros((8, 4), np.int16)
+		data[6, 2] = 9999
+		namespace = {'b1': ma.array(data)}
+		expected = rasterCalc.evaluate('b1 * 1', namespace)
+		for write in (rasterCalc.writetiles, rasterCalc.writeparallel):
+			fname = os.path.join(self.tempdir, write.__name__ + '.tif')
+			write('b1 * 1', namespace, fname, 'GTiff', 4, 8, (0, 1, 0, 0, 0, -1), 4326, tilerows=2)
+			result = self.readback(fname)
+			self.assertEqual(ma.count_masked(result), 0)
+			self.assertTrue(np.all(ma.getdata(result) == ma.getdata(expected)))
+
+	def test_nodatatype(self):
+		self.assertEqual(rasterCalc._nodatatype((0, 255)), (rasterIO.GDT_UInt16, 9999))
+		self.assertEqual(rasterCalc._nodatatype((-32768, 32767)), (rasterIO.GDT_Int32, 32768))
+		self.assertEqual(rasterCalc._nodatatype((0, 65535)), (rasterIO.GDT_UInt32, 65536))
+
+if __name__ == '__main__':
+	unittest.main()